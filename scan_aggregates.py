@@ -0,0 +1,302 @@
+"""
+
+    scan_aggregates.py
+
+    Grouped scan counts on the pandas, NumPy, Polars, SQLite and DuckDB backends, and the statistics derived from
+    them. Every function takes the scan table as an argument, so the app and the tests run the same code.
+
+"""
+
+
+# Standard Library Imports
+import sqlite3
+
+# Third-party Imports
+import numpy as np
+import pandas as pd
+
+# Local Imports
+from scan_statistics import grouped_mean_confidence_interval
+
+# Optional Imports
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+try:
+    import polars as pl
+except ImportError:
+    pl = None
+
+# Aggregate backends: 'pandas' groups the in-memory frame, 'numpy' counts factorized codes with one bincount,
+# 'polars' runs a lazy query plan, and 'sqlite' or 'duckdb' run the aggregates as queries against an embedded
+# database file
+aggregate_backends = ('pandas', 'numpy', 'polars', 'sqlite', 'duckdb')
+optional_backend_modules = {'polars': pl, 'duckdb': duckdb}
+
+# Columns handed to the Polars and SQL backends; the SQL table stores timestamps and derived keys as text so both
+# engines group them alike
+sql_scan_columns = ['bag_scan_timestamp', 'bag_licence_plate', 'scan_machine_id', 'scan_machine_cluster',
+                    'scan_machine_level', 'scan_machine_result', 'scan_machine_result_reason', 'week_of_day',
+                    'day', 'hour', '15_min_interval']
+
+# Chapter aggregates: the grouping keys, an optional (column, value) filter and the index names of the result
+chapter_aggregates = {
+    'throughput_by_day': (['day'], None, ['day']),
+    'throughput_by_hour': (['hour'], None, ['hour']),
+    'throughput_by_15_min': (['15_min_interval'], None, ['15_min_interval']),
+    'throughput_by_weekday': (['week_of_day'], None, ['week_of_day']),
+    'timeout_by_machine': (['scan_machine_id'], ('scan_machine_result_reason', 'Time out'), ['scan_machine_id']),
+    'bags_per_machine': (['scan_machine_id'], None, ['scan_machine_id']),
+    'bags_per_cluster': (['scan_machine_cluster'], None, ['scan_machine_cluster']),
+    'level_2_by_day': (['day'], ('scan_machine_level', 'Level 2'), ['bag_scan_timestamp']),
+    'level_2_by_machine': (['scan_machine_id'], ('scan_machine_level', 'Level 2'), ['scan_machine_id']),
+    'level_2_by_cluster': (['scan_machine_cluster'], ('scan_machine_level', 'Level 2'), ['scan_machine_cluster']),
+    'scans_per_bag': (['bag_licence_plate'], None, ['bag_licence_plate']),
+    'machine_performance': (['scan_machine_id', 'scan_machine_result'], None,
+                            ['scan_machine_id', 'scan_machine_result'])
+}
+
+
+# Function to add the time keys used throughout the chapters
+def add_time_keys(frame):
+    """
+    Parses the scan timestamps and adds the weekday, day, hour and 15-minute interval keys in place. Timestamps that
+    are already datetime64, such as the memory-mapped column of the column store, are used as they are. The weekday
+    and day keys are categoricals (integer codes into the sorted weekday names and dates) rather than one Python
+    object per row.
+    """
+    # Ensure the 'bag_scan_timestamp' column is parsed as datetime
+    if not pd.api.types.is_datetime64_dtype(frame['bag_scan_timestamp']):
+        frame['bag_scan_timestamp'] = pd.to_datetime(frame['bag_scan_timestamp'], errors='coerce')
+    timestamps = frame['bag_scan_timestamp']
+
+    # Day key: the code of every scan's date among the sorted dates (-1 for a missing timestamp)
+    day_codes, days = pd.factorize(timestamps.dt.normalize(), sort=True)
+    frame['day'] = pd.Categorical.from_codes(day_codes, categories=pd.Index(days.date))
+
+    # Add a new column 'week_of_day' for the day of the week based on the date, coded through the day codes (the
+    # appended -1 keeps missing days missing)
+    weekday_names = np.unique(days.day_name())
+    weekday_codes = np.append(np.searchsorted(weekday_names, days.day_name()), -1)[day_codes]
+    frame['week_of_day'] = pd.Categorical.from_codes(weekday_codes, categories=weekday_names)
+
+    # Hour and 15-minute interval keys for the throughput sections
+    frame['hour'] = timestamps.dt.hour
+    frame['15_min_interval'] = timestamps.dt.floor('15T')
+    return frame
+
+
+# Function to select the rows whose column holds one of the given values
+def selection_vector(frame, column, values):
+    """
+    Returns a NumPy boolean selection vector; missing values are never selected, so the vector is the same for object
+    and Arrow-backed columns and every filter of the scan table can reuse it instead of comparing strings again.
+    """
+    return frame[column].isin(values).to_numpy(dtype=bool)
+
+
+# Function to copy Arrow-backed values into a contiguous NumPy array
+def numpy_buffer(values):
+    """
+    Returns numbers and timestamps in their NumPy dtype and text as objects (missing text as NaN, as in the default
+    storage), so Plotly and NumPy consume one contiguous buffer instead of iterating over Arrow chunks.
+    """
+    if not isinstance(values.dtype, pd.ArrowDtype):
+        return np.ascontiguousarray(values)
+    numpy_dtype = values.dtype.numpy_dtype
+    if numpy_dtype.kind in 'OUS':
+        return values.to_numpy(dtype=object, na_value=np.nan)
+    return np.ascontiguousarray(values.to_numpy(dtype=numpy_dtype))
+
+
+# Function to return the sorted integer codes of the selected rows of a key column and its labels
+def sorted_key_codes(values, selected):
+    """
+    Uses the codes and categories of a categorical column as they are and factorizes the selected values of any
+    other column with sorted labels, so both give codes in label order; categorical labels keep the column dtype.
+    """
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return values.cat.codes.to_numpy()[selected], pd.CategoricalIndex(values.cat.categories, dtype=values.dtype)
+    return pd.factorize(numpy_buffer(values)[selected], sort=True)
+
+
+# Function to return the columns the Polars and SQL backends load
+def plain_scan_columns(frame):
+    """
+    Selects the backend columns and decodes categorical columns to the dtype of their labels, since the engines
+    would otherwise load them as their own dictionary types.
+    """
+    return pd.DataFrame({column: frame[column].astype(frame[column].cat.categories.dtype)
+                         if isinstance(frame[column].dtype, pd.CategoricalDtype) else frame[column]
+                         for column in sql_scan_columns})
+
+
+# Function to count the scans per key combination with pandas
+def pandas_grouped_count(frame, keys, where):
+    """
+    Groups the (optionally filtered) scan table by the keys and counts the rows of each group; only observed key
+    combinations are kept, also for categorical keys.
+    """
+    scans = frame if where is None else frame[selection_vector(frame, where[0], [where[1]])]
+    return scans.groupby(keys, observed=True).size()
+
+
+# Function to count the scans per key combination with NumPy
+def numpy_grouped_count(frame, keys, where):
+    """
+    Takes the sorted integer codes of each key, counts every code combination with one bincount over the flattened
+    index and keeps the non-empty combinations, which matches the group order of pandas.
+    """
+    selected = np.ones(len(frame), dtype=bool) if where is None else selection_vector(frame, where[0], [where[1]])
+    codes, uniques = zip(*(sorted_key_codes(frame[key], selected) for key in keys))
+    present_keys = np.logical_and.reduce([key_codes >= 0 for key_codes in codes])
+    shape = tuple(len(key_uniques) for key_uniques in uniques)
+    counts = np.bincount(np.ravel_multi_index([key_codes[present_keys] for key_codes in codes], shape),
+                         minlength=int(np.prod(shape)))
+    groups = np.flatnonzero(counts)
+    key_values = [key_uniques[positions] for key_uniques, positions in zip(uniques, np.unravel_index(groups, shape))]
+    index = (pd.MultiIndex.from_arrays(key_values, names=keys) if len(keys) > 1
+             else pd.Index(key_values[0], name=keys[0]))
+    return pd.Series(counts[groups], index=index)
+
+
+# Function to copy the scan table into Polars
+def polars_scan_table(frame):
+    """
+    Returns the columns the Polars backend queries as a Polars DataFrame.
+    """
+    return pl.from_pandas(plain_scan_columns(frame))
+
+
+# Function to count the scans per key combination with a Polars lazy query
+def polars_grouped_count(scans, keys, where):
+    """
+    Builds a lazy filter / group-by / sort plan over the Polars copy of the scan table and collects the rows,
+    dropping rows with a missing key as the pandas group-by does.
+    """
+    scans = scans.lazy().filter(pl.all_horizontal(pl.col(keys).is_not_null()))
+    if where is not None:
+        scans = scans.filter(pl.col(where[0]) == where[1])
+    return scans.group_by(keys).agg(pl.len()).sort(keys).collect().to_pandas()
+
+
+# Function to connect to the embedded database of a SQL backend
+def connect_sql_backend(backend, database_path):
+    """
+    Opens the SQLite or DuckDB database file; DuckDB runs its queries multi-threaded and spills to disk on its own.
+    """
+    if backend == 'duckdb':
+        return duckdb.connect(database_path)
+    return sqlite3.connect(database_path)
+
+
+# Function to (re)load the scan table into the database when the CSV has changed
+def prepare_sql_backend(backend, database_path, source_fingerprint, frame):
+    """
+    Stores the scan table and the fingerprint of the CSV it came from, and reloads the table only when that
+    fingerprint differs, so reruns reuse the database file.
+    """
+    connection = connect_sql_backend(backend, database_path)
+    try:
+        connection.execute('CREATE TABLE IF NOT EXISTS scan_source (fingerprint TEXT)')
+        stored = connection.execute('SELECT fingerprint FROM scan_source').fetchall()
+        if stored != [(source_fingerprint,)]:
+            scan_table = plain_scan_columns(frame).astype({'bag_scan_timestamp': str, 'day': str,
+                                                           '15_min_interval': str})
+            connection.execute('DROP TABLE IF EXISTS scans')
+            if backend == 'duckdb':
+                connection.register('scan_table', scan_table)
+                connection.execute('CREATE TABLE scans AS SELECT * FROM scan_table')
+            else:
+                scan_table.to_sql('scans', connection, index=False)
+            connection.execute('DELETE FROM scan_source')
+            connection.execute('INSERT INTO scan_source VALUES (?)', [source_fingerprint])
+            if backend == 'sqlite':
+                connection.commit()
+    finally:
+        connection.close()
+
+
+# Function to run an aggregate query against a SQL backend
+def execute_aggregate_query(backend, database_path, query, parameters):
+    """
+    Runs one parameterized aggregate query and returns its rows as a list of tuples.
+    """
+    connection = connect_sql_backend(backend, database_path)
+    try:
+        return connection.execute(query, parameters).fetchall()
+    finally:
+        connection.close()
+
+
+# Function to build the SQL equivalent of a grouped count
+def aggregate_query(keys, where):
+    """
+    Returns the GROUP BY query for the keys, with the filter value passed as a query parameter; rows with a
+    missing key are left out as the pandas group-by does.
+    """
+    columns = ', '.join(f'"{key}"' for key in keys)
+    conditions = [f'"{key}" IS NOT NULL' for key in keys] + ([f'"{where[0]}" = ?'] if where is not None else [])
+    return (f'SELECT {columns}, COUNT(*) FROM scans WHERE {" AND ".join(conditions)} GROUP BY {columns} '
+            f'ORDER BY {columns}',
+            tuple(where[1:]) if where is not None else ())
+
+
+# Function to turn the rows returned by the Polars or SQL backend into a pandas-shaped count
+def restore_grouped_count(rows, keys, frame):
+    """
+    Casts the key columns back to the dtypes of the scan table (categorical dates and weekdays, 15-minute timestamps,
+    integer hours) and indexes the counts by them.
+    """
+    rows = pd.DataFrame(rows).set_axis([*keys, 'count'], axis=1) if len(rows) else pd.DataFrame(
+        columns=[*keys, 'count'])
+    key_values = pd.DataFrame({key: (pd.to_datetime(rows[key]).dt.date if key == 'day' else rows[key]).astype(
+        frame[key].dtype) for key in keys})
+    index = (pd.MultiIndex.from_frame(key_values) if len(keys) > 1
+             else pd.Index(key_values[keys[0]], name=keys[0]))
+    return pd.Series(rows['count'].astype(np.int64).to_numpy(), index=index)
+
+
+# Function to count the scans per key combination on any backend
+def grouped_count(backend, frame, keys, where, source=None, run_query=execute_aggregate_query):
+    """
+    Dispatches one grouped count to the backend; every backend returns the same Series as the pandas group-by. The
+    source is the Polars copy or the SQL database path of the backend, and run_query(backend, database_path, query,
+    parameters) runs the SQL, so callers can put a cache in front of it.
+    """
+    if backend == 'pandas':
+        return pandas_grouped_count(frame, keys, where)
+    if backend == 'numpy':
+        return numpy_grouped_count(frame, keys, where)
+    if backend == 'polars':
+        return restore_grouped_count(polars_grouped_count(source, keys, where), keys, frame)
+
+    query, parameters = aggregate_query(keys, where)
+    return restore_grouped_count(run_query(backend, source, query, parameters), keys, frame)
+
+
+# Function to return a chapter aggregate from a backend in the shape the chapters use
+def evaluate_chapter_aggregate(name, backend, frame, source=None, run_query=execute_aggregate_query):
+    """
+    Evaluates the named aggregate on the backend, names the index as the chapter expects and unstacks two-key
+    aggregates into a table.
+    """
+    keys, where, index_names = chapter_aggregates[name]
+    aggregate = grouped_count(backend, frame, keys, where, source, run_query).rename_axis(index_names)
+    return aggregate.unstack(fill_value=0) if len(keys) > 1 else aggregate
+
+
+# Function to derive the statistics the chapters build on the aggregates
+def derived_statistics(aggregates):
+    """
+    Returns the Level 2 proportions per machine, the recirculation counts and the 15-minute throughput interval
+    statistics computed from a dict of chapter aggregates.
+    """
+    scans_per_bag = aggregates['scans_per_bag']
+    return {
+        'level_2_proportions': round(aggregates['level_2_by_machine'] / aggregates['bags_per_machine'],
+                                     2).sort_values(ascending=False),
+        'recirculation_frequency': scans_per_bag[scans_per_bag > 1].value_counts().sort_index(),
+        'throughput_interval_stats': grouped_mean_confidence_interval(aggregates['throughput_by_15_min'].to_numpy())
+    }
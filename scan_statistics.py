@@ -0,0 +1,184 @@
+"""
+
+    scan_statistics.py
+
+    Confidence intervals for the means, proportions and rates the chapters report: t-based intervals of grouped
+    means, Wilson and Agresti-Coull intervals of proportions, and percentile bootstrap intervals of machine rates.
+    Also the batched CUSUM change-point detector, with its decision interval calibrated to the series length.
+
+"""
+
+
+# Standard Library Imports
+from concurrent.futures import ProcessPoolExecutor
+
+# Third-party Imports
+import numpy as np
+import pandas as pd
+import scipy.stats as stats
+from scipy.optimize import brentq
+
+
+# Function to compute t-based confidence intervals of the mean for many groups at once
+def grouped_mean_confidence_interval(values, group_codes=None, confidence_level=0.95):
+    """
+    Computes the count, mean, sample standard deviation and t-based confidence interval of the mean for every group
+    at once from a flat array of values and their integer group codes (one group when no codes are given).
+    """
+    values = np.asarray(values, dtype=float)
+    if group_codes is None:
+        group_codes = np.zeros(len(values), dtype=np.int64)
+    count = np.bincount(group_codes).astype(float)
+    mean = np.bincount(group_codes, weights=values) / count
+    std = np.sqrt(np.bincount(group_codes, weights=(values - mean[group_codes]) ** 2) / (count - 1))
+    margin_of_error = stats.t.ppf((1 + confidence_level) / 2, df=count - 1) * std / np.sqrt(count)
+    return pd.DataFrame({
+        'count': count,
+        'mean': mean,
+        'std': std,
+        'margin_of_error': margin_of_error,
+        'ci_lower': mean - margin_of_error,
+        'ci_upper': mean + margin_of_error
+    })
+
+
+# Function to compute confidence intervals for many proportions at once
+def proportion_confidence_interval(successes, trials, confidence_level=0.95, method='wilson'):
+    """
+    Computes Wilson or Agresti-Coull confidence intervals for arrays of successes out of trials, such as Level 2
+    escalations or time-outs out of the bags processed by each machine.
+    """
+    successes = np.asarray(successes, dtype=float)
+    trials = np.asarray(trials, dtype=float)
+    z = stats.norm.ppf((1 + confidence_level) / 2)
+    if method == 'wilson':
+        proportion = successes / trials
+        denominator = 1 + z ** 2 / trials
+        center = (proportion + z ** 2 / (2 * trials)) / denominator
+        margin_of_error = z * np.sqrt(proportion * (1 - proportion) / trials + z ** 2 / (4 * trials ** 2)) / denominator
+    elif method == 'agresti-coull':
+        adjusted_trials = trials + z ** 2
+        center = (successes + z ** 2 / 2) / adjusted_trials
+        margin_of_error = z * np.sqrt(center * (1 - center) / adjusted_trials)
+    else:
+        raise ValueError(f"Unknown proportion interval method: {method}")
+    return pd.DataFrame({
+        'proportion': successes / trials,
+        'ci_lower': np.clip(center - margin_of_error, 0, 1),
+        'ci_upper': np.clip(center + margin_of_error, 0, 1)
+    })
+
+
+# Function to draw bootstrap replicates of every machine's rate at once
+def bootstrap_rate_replicates(successes, trials, n_replicates, seed):
+    """
+    Resampling a machine's bags with replacement makes its success count binomial, so one binomial draw of shape
+    (replicates x machines) replaces the loops over machines and replicates.
+    """
+    rng = np.random.default_rng(seed)
+    return rng.binomial(trials, successes / trials, size=(n_replicates, len(trials))) / trials
+
+
+# Function to compute percentile bootstrap intervals, optionally spreading the replicates over a process pool
+def bootstrap_rate_intervals(successes, trials, n_replicates, confidence_level=0.95, seed=42, workers=1):
+    """
+    Returns the observed rate and the percentile bootstrap interval of every machine. The replicates are split into
+    one chunk per worker, each with its own child seed, so results are reproducible for a given seed and worker count.
+    """
+    successes = np.asarray(successes, dtype=np.int64)
+    trials = np.asarray(trials, dtype=np.int64)
+    chunk_sizes = [len(chunk) for chunk in np.array_split(np.arange(n_replicates), workers)]
+    chunk_seeds = np.random.SeedSequence(seed).spawn(workers)
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            replicates = np.vstack(list(pool.map(bootstrap_rate_replicates, [successes] * workers,
+                                                 [trials] * workers, chunk_sizes, chunk_seeds)))
+    else:
+        replicates = bootstrap_rate_replicates(successes, trials, n_replicates, chunk_seeds[0])
+    lower, upper = np.quantile(replicates, [(1 - confidence_level) / 2, (1 + confidence_level) / 2], axis=0)
+    return pd.DataFrame({'rate': successes / trials, 'ci_lower': lower, 'ci_upper': upper})
+
+
+# Function to choose the CUSUM decision interval that keeps false alarms rare over a whole series
+def cusum_threshold(n_periods, allowance=0.5, false_alarm_probability=0.05):
+    """
+    Solves Siegmund's approximation of the in-control average run length of a one-sided CUSUM,
+    (exp(2kb) - 2kb - 1) / (2k^2) with b = h + 1.166, for the decision interval h at which a two-sided CUSUM
+    (half that run length) raises a false alarm within n_periods of unit-variance noise with the given probability.
+    Longer series need a wider interval, so the false-alarm rate per series does not grow with its length.
+    """
+    required_run_length = 2 * n_periods / -np.log1p(-false_alarm_probability)
+    return brentq(lambda h: np.log(np.expm1(2 * allowance * (h + 1.166)) - 2 * allowance * (h + 1.166)) -
+                  np.log(2 * allowance ** 2 * required_run_length), 0, 100)
+
+
+# Function to standardize every row of a (series x time) panel after removing its seasonal profile
+def standardize_panel(panel, season_length, baseline_periods):
+    """
+    Subtracts each row's per-phase median (e.g. the hour-of-day profile), centres the residuals on their median
+    over the first baseline_periods and divides by a robust scale from the MAD of their first differences, so a
+    level shift stands out from noise and seasonality. Missing periods (rates with no throughput) stay NaN.
+    """
+    phases = np.arange(panel.shape[1]) % season_length
+    seasonal_profile = np.stack([np.nanmedian(panel[:, phases == phase], axis=1)
+                                 for phase in range(season_length)], axis=1)
+    residuals = panel - seasonal_profile[:, phases]
+    residuals = residuals - np.nanmedian(residuals[:, :baseline_periods], axis=1, keepdims=True)
+
+    differences = np.diff(residuals, axis=1)
+    scale = np.nanmedian(np.abs(differences - np.nanmedian(differences, axis=1, keepdims=True)), axis=1)
+    scale = np.where(scale > 0, scale / (0.6745 * np.sqrt(2)), np.nanstd(residuals, axis=1))
+    scale = np.where(scale > 0, scale, 1.0)
+
+    return residuals / scale[:, None]
+
+
+# Function to run a self-starting two-sided tabular CUSUM on every row of a panel at once
+def batched_cusum(panel, baseline_periods, allowance=0.5, false_alarm_probability=0.05):
+    """
+    Compares every period after the first baseline_periods with the mean and standard deviation of all earlier
+    periods of its row and maps the resulting t statistic to a standard normal score (self-starting CUSUM), so the
+    reference grows with the series instead of resting on one short window and the scores have unit variance
+    however well the panel was scaled. The upper and lower CUSUM statistics of all rows are accumulated together,
+    one period at a time, against the decision interval calibrated to the number of monitored periods; missing
+    periods contribute nothing. Returns the first alarm period, the estimated start of the shift (the period after
+    the statistic last sat at zero) and the direction (+1 / -1) for every row; rows without an alarm get -1 and 0.
+    """
+    n_series, n_periods = panel.shape
+    observed = np.isfinite(panel)
+    values = np.where(observed, panel, 0)
+    earlier_counts = np.cumsum(observed, axis=1) - observed
+    earlier_sums = np.cumsum(values, axis=1) - values
+    earlier_square_sums = np.cumsum(values ** 2, axis=1) - values ** 2
+    with np.errstate(invalid='ignore', divide='ignore'):
+        earlier_means = earlier_sums / earlier_counts
+        earlier_variances = (earlier_square_sums - earlier_sums * earlier_means) / (earlier_counts - 1)
+        t_scores = (values - earlier_means) / np.sqrt(earlier_variances * (1 + 1 / earlier_counts))
+        scores = stats.norm.ppf(stats.t.cdf(t_scores, df=earlier_counts - 1))
+    monitored = (observed & (earlier_counts >= 2) & (np.arange(n_periods) >= baseline_periods) &
+                 np.isfinite(scores))
+    scores = np.where(monitored, scores, 0)
+    threshold = cusum_threshold(max(n_periods - baseline_periods, 1), allowance, false_alarm_probability)
+
+    upper, lower = np.zeros(n_series), np.zeros(n_series)
+    upper_start, lower_start = np.zeros(n_series, dtype=int), np.zeros(n_series, dtype=int)
+    alarm = np.full(n_series, -1)
+    start = np.full(n_series, -1)
+    direction = np.zeros(n_series, dtype=int)
+
+    for period in range(n_periods):
+        slack = allowance * monitored[:, period]
+        upper = np.maximum(0, upper + scores[:, period] - slack)
+        lower = np.maximum(0, lower - scores[:, period] - slack)
+        upper_start = np.where(upper == 0, period + 1, upper_start)
+        lower_start = np.where(lower == 0, period + 1, lower_start)
+
+        new_upper = (alarm < 0) & (upper > threshold)
+        new_lower = (alarm < 0) & ~new_upper & (lower > threshold)
+        alarm[new_upper | new_lower] = period
+        start[new_upper] = upper_start[new_upper]
+        start[new_lower] = lower_start[new_lower]
+        direction[new_upper] = 1
+        direction[new_lower] = -1
+
+    return alarm, start, direction
@@ -7,19 +7,39 @@
 
 # Standard Library Imports
 import os
+import json
+import hashlib
 import math
+import time
 import warnings
 import requests
+from concurrent.futures import ProcessPoolExecutor
 
 # Third-party Imports
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
 import pandas as pd
 import streamlit as st
 import scipy.stats as stats
+from scipy.signal import lfilter
+from scipy.optimize import milp, LinearConstraint, Bounds
+from scipy.sparse import coo_matrix
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 
+# Optional Imports
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+# Local Imports
+from scan_aggregates import (aggregate_backends, optional_backend_modules, add_time_keys, selection_vector,
+                             numpy_buffer, polars_scan_table, prepare_sql_backend, execute_aggregate_query,
+                             chapter_aggregates, evaluate_chapter_aggregate, derived_statistics)
+from scan_statistics import (grouped_mean_confidence_interval, proportion_confidence_interval,
+                             bootstrap_rate_intervals, standardize_panel, batched_cusum)
 
 # Turn off Warnings for better visualization
 warnings.filterwarnings("ignore")
@@ -71,11 +91,204 @@ st.markdown(f""" ### Introduction""")
 st.markdown(f""" #### Read in the data""")
 
 
-# Set the path to the CSV file located in the same directory as the Python file
-file_path = os.path.join(script_dir, 'Xray_Scan_Data_Jul_2022.csv')
+# Set the path to the CSV file located in the same directory as the Python file (SCAN_DATA_CSV points elsewhere)
+file_path = os.environ.get('SCAN_DATA_CSV', os.path.join(script_dir, 'Xray_Scan_Data_Jul_2022.csv'))
+
+# Column storage: 'numpy' (default) reads object columns, 'arrow' keeps the text columns in Arrow string buffers
+# (pandas ArrowDtype), which are several times smaller and sliced without copying Python objects
+scan_data_dtypes = os.environ.get('SCAN_DATA_DTYPES', 'numpy').lower()
+if scan_data_dtypes not in ('numpy', 'arrow'):
+    raise ValueError(f"Unknown SCAN_DATA_DTYPES: {scan_data_dtypes}")
+if scan_data_dtypes == 'arrow' and pa is None:
+    st.warning("SCAN_DATA_DTYPES is 'arrow' but the pyarrow package is not installed; using numpy instead.")
+    scan_data_dtypes = 'numpy'
+
+# Scan data source: 'csv' (default) parses the CSV on every run, 'columns' opens a memory-mapped column store next to
+# the CSV (one .npy file per column plus metadata.json), so all worker processes share one copy in the page cache
+scan_data_source = os.environ.get('SCAN_DATA_SOURCE', 'csv').lower()
+if scan_data_source not in ('csv', 'columns'):
+    raise ValueError(f"Unknown SCAN_DATA_SOURCE: {scan_data_source}")
+
+# Fingerprint of the CSV (size and modification time) that marks the column store and SQL databases as current
+csv_fingerprint = f'{os.path.getsize(file_path)}-{os.path.getmtime(file_path)}'
+
+# Column store layout: the timestamps as datetime64 and every other column as integer codes into its sorted labels,
+# which are stored beside the codes in their own dtype (text as an Arrow file, or a fixed-width string array without
+# pyarrow)
+column_store_path = os.path.splitext(file_path)[0] + '.columns'
+column_store_files = {
+    'bag_scan_timestamp': ('timestamps.npy', None),
+    'bag_licence_plate': ('plate_codes.npy', 'plate_labels.npy'),
+    'scan_machine_id': ('machine_codes.npy', 'machine_labels.npy'),
+    'scan_machine_cluster': ('cluster_codes.npy', 'cluster_labels.npy'),
+    'scan_machine_level': ('level_codes.npy', 'level_labels.npy'),
+    'scan_machine_result': ('result_codes.npy', 'result_labels.npy'),
+    'scan_machine_result_reason': ('reason_codes.npy', 'reason_labels.npy')
+}
+
+
+# Function to read the scan CSV with the configured column storage
+def read_scan_csv():
+    """
+    Reads the CSV into object columns, or into Arrow string columns when SCAN_DATA_DTYPES is 'arrow'.
+    """
+    if scan_data_dtypes == 'arrow':
+        return pd.read_csv(file_path, dtype_backend='pyarrow')
+    return pd.read_csv(file_path)
+
+
+# Function to write the scan table as a column store
+def write_column_store(frame, store_path, source_fingerprint):
+    """
+    Saves the parsed timestamps, and the categorical codes (missing values as -1, in the integer width pandas uses
+    for that many labels) and sorted labels of each other column, to .npy files, then the metadata with the row count,
+    files, label dtypes and CSV fingerprint. With pyarrow installed, text labels go to Arrow IPC files instead, which
+    readers map without decoding. Every file is written under a temporary name and renamed into place, and the
+    metadata goes last, so readers never open a half-written store.
+    """
+    os.makedirs(store_path, exist_ok=True)
+    store_files, store_arrays, label_dtypes = {}, {}, {}
+    for column, (values_file, labels_file) in column_store_files.items():
+        if labels_file is None:
+            store_arrays[values_file] = pd.to_datetime(frame[column], errors='coerce').to_numpy(dtype='datetime64[ns]')
+        else:
+            codes, labels = pd.factorize(frame[column], sort=True)
+            labels = numpy_buffer(labels)
+            store_arrays[values_file] = pd.Categorical.from_codes(codes, categories=labels).codes
+            if labels.dtype == object and pa is not None:
+                labels_file = os.path.splitext(labels_file)[0] + '.arrow'
+                store_arrays[labels_file] = pa.array(labels, type=pa.string())
+            else:
+                store_arrays[labels_file] = labels.astype(str) if labels.dtype == object else labels
+            label_dtypes[column] = labels.dtype.name
+        store_files[column] = (values_file, labels_file)
+    for file_name, values in store_arrays.items():
+        temporary_path = os.path.join(store_path, f'{file_name}.{os.getpid()}.tmp')
+        if file_name.endswith('.arrow'):
+            labels_table = pa.table({'labels': values})
+            with pa.OSFile(temporary_path, 'wb') as column_file:
+                with pa.ipc.new_file(column_file, labels_table.schema) as writer:
+                    writer.write_table(labels_table)
+        else:
+            with open(temporary_path, 'wb') as column_file:
+                np.save(column_file, values)
+        os.replace(temporary_path, os.path.join(store_path, file_name))
+
+    metadata = {'source_fingerprint': source_fingerprint, 'rows': len(frame), 'columns': store_files,
+                'label_dtypes': label_dtypes, 'arrow_labels': pa is not None}
+    temporary_path = os.path.join(store_path, f'metadata.json.{os.getpid()}.tmp')
+    with open(temporary_path, 'w') as metadata_file:
+        json.dump(metadata, metadata_file)
+    os.replace(temporary_path, os.path.join(store_path, 'metadata.json'))
+
+
+# Function to open the column store as read-only memory maps
+def open_column_store(store_path, source_fingerprint):
+    """
+    Returns the memory-mapped columns and the labels (in their original dtype) of the coded columns, or None when
+    the store is missing, was built from a different CSV or with a different label format than this process writes
+    (Arrow labels with pyarrow installed). Text labels from Arrow files stay Arrow strings over the mapped buffers.
+    Opening maps the files without reading them; pages load on first access.
+    """
+    metadata_path = os.path.join(store_path, 'metadata.json')
+    if not os.path.exists(metadata_path):
+        return None
+    with open(metadata_path) as metadata_file:
+        metadata = json.load(metadata_file)
+    if (metadata['source_fingerprint'] != source_fingerprint or 'label_dtypes' not in metadata or
+            metadata.get('arrow_labels', False) != (pa is not None)):
+        return None
+    store = {'columns': {}, 'labels': {}}
+    for column, (values_file, labels_file) in metadata['columns'].items():
+        store['columns'][column] = np.load(os.path.join(store_path, values_file), mmap_mode='r')
+        if labels_file is None:
+            continue
+        if labels_file.endswith('.arrow'):
+            labels = pa.ipc.open_file(pa.memory_map(os.path.join(store_path, labels_file))).read_all()['labels']
+            store['labels'][column] = pd.Index(pd.arrays.ArrowExtensionArray(labels))
+        else:
+            store['labels'][column] = pd.Index(np.load(os.path.join(store_path, labels_file), mmap_mode='r'),
+                                               dtype=metadata['label_dtypes'][column])
+    return store
+
+
+# Function to build the scan table from the column store
+def frame_from_column_store(store):
+    """
+    Wraps the memory-mapped timestamps and codes without copying: every coded column becomes a pandas Categorical
+    over its memory-mapped codes and labels (code -1 is missing), so worker processes share the column data in the
+    page cache instead of each decoding private copies of the values.
+    """
+    columns = {}
+    for column, values in store['columns'].items():
+        if column in store['labels']:
+            values = pd.Categorical.from_codes(values, categories=store['labels'][column])
+        columns[column] = values
+    return pd.DataFrame(columns, copy=False)
+
+
+# Function to load the prepared scan table once per process
+@st.cache_resource(show_spinner=False)
+def load_scan_table(source_key):
+    """
+    Reads the scan table from the CSV, or from the column store (building it first when missing or out of date),
+    parses the timestamps and adds the weekday, day, hour and 15-minute keys used throughout the chapters. The source
+    key (CSV fingerprint, data source, column storage) identifies the table. st.cache_resource hands every session
+    the same frame instead of a copy, so it is read-only: the chapters only filter, sort and group it into new
+    frames. Returns the frame and the open column store (None when reading the CSV).
+    """
+    scan_column_store = None
+    if scan_data_source == 'columns':
+        scan_column_store = open_column_store(column_store_path, csv_fingerprint)
+        if scan_column_store is None:
+            write_column_store(read_scan_csv(), column_store_path, csv_fingerprint)
+            scan_column_store = open_column_store(column_store_path, csv_fingerprint)
+        data = frame_from_column_store(scan_column_store)
+    else:
+        data = read_scan_csv()
+    return add_time_keys(data), scan_column_store
+
+
+# Function to fingerprint the source files of the app and its local modules
+def source_code_fingerprint(paths):
+    """
+    Hashes the source files. A shared result depends only on the scan source and on code in these files, both the
+    computation itself and the globals it reads, so any edit to them gives a new fingerprint.
+    """
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, 'rb') as source:
+            digest.update(source.read())
+    return digest.hexdigest()
+
+
+# Function to cache a shared result per name, scan source and code fingerprint
+@st.cache_resource(show_spinner=False)
+def cached_data_product(name, source_key, code_key, _compute):
+    """
+    Computes the result once per process for each key and hands the same object to every session.
+    """
+    return _compute()
+
+
+# Function to share a result that depends only on the scan table across sessions
+def shared_data_product(name, source_key, compute):
+    """
+    Computes the named result once per process and scan source and hands the same object to every session, so
+    filtered tables and aggregates are held once however many viewers are connected; callers must not modify
+    the result in place. The fingerprint of the app's source files is part of the key, so editing the computation,
+    or the code behind any global it reads, while the server runs computes the result afresh instead of serving the
+    one cached under the same name.
+    """
+    return cached_data_product(name, source_key, app_code_fingerprint, compute)
+
 
-# Read the CSV file
-data = pd.read_csv(file_path)
+app_code_fingerprint = source_code_fingerprint([__file__, add_time_keys.__code__.co_filename,
+                                               proportion_confidence_interval.__code__.co_filename])
+scan_source_key = (csv_fingerprint, scan_data_source, scan_data_dtypes)
+scan_source_fingerprint = '-'.join(scan_source_key)
+data, scan_column_store = load_scan_table(scan_source_key)
+scan_table_columns = list(column_store_files)
 
 # Check if the DataFrame is not empty
 if not data.empty:  # data.empty returns True if the DataFrame is empty
@@ -98,18 +311,18 @@ st.markdown(f""" #### Look at data
 - How many rows are in the dataset?
 #### `{len(data):,}`
 - How many columns are in this dataset? 
-#### `{len(data.columns)}`
+#### `{len(scan_table_columns)}`
 - Is the data complete? 
 """)
 
 
 # Calculate the percentage of not null values
-not_null_percentage = (data.notnull().sum() / len(data)) * 100
+not_null_percentage = (data[scan_table_columns].notnull().sum() / len(data)) * 100
 for column, percentage in not_null_percentage.items():
     st.write(f"###### Percentage of not null values in `{column}` column is: `{round(percentage, 2)}`% not null")
 
 st.markdown(f""" ##### Look at data""")
-st.dataframe(data.tail(5))
+st.dataframe(data[scan_table_columns].tail(5))
 
 # Describe Possible Goals
 st.markdown(f""" #### What are questions that can be addressed using this data?
@@ -144,16 +357,6 @@ st.markdown(f""" #### What are questions that can be addressed using this data?
 - Are operator interventions more frequent during specific times or at certain machines?
 """)
 
-# Initial data manipulation
-# Ensure the 'bag_scan_timestamp' column is parsed as datetime
-data['bag_scan_timestamp'] = pd.to_datetime(data['bag_scan_timestamp'], errors='coerce')
-
-# Add a new column 'week_of_day' for the day of the week based on the date
-data['week_of_day'] = pd.to_datetime(data['bag_scan_timestamp'].dt.date).dt.day_name()
-
-# Convert the bag_scan_timestamp to datetime format for time-based analysis
-data['bag_scan_timestamp'] = pd.to_datetime(data['bag_scan_timestamp'])
-
 st.markdown(f"""## Chapter - 1""")
 st.markdown(f"""### Throughput and Load Distribution""")
 st.write(" - How many bags are processed each day?")
@@ -164,15 +367,166 @@ st.write(" - How many bags are processed at specific time intervals such as hour
 # Throughput by Day Section
 st.write("### Throughput by Day")
 
-# Data Manipulation for Throughput Section
-data['day'] = data['bag_scan_timestamp'].dt.date
-data['hour'] = data['bag_scan_timestamp'].dt.hour
-data['15_min_interval'] = data['bag_scan_timestamp'].dt.floor('15T')
+
+# Function to return the sorted integer codes and labels of a text column
+def scan_column_codes(column):
+    """
+    Widens the memory-mapped codes of the column store when it is open (stored in the narrowest integer type, too
+    small for the flattened index arithmetic) and factorizes the column otherwise; both give the same codes because
+    the store is factorized with sorted labels.
+    """
+    if scan_column_store is None:
+        return pd.factorize(data[column], sort=True)
+    return scan_column_store['columns'][column].astype(np.intp), scan_column_store['labels'][column]
+
+
+# Epoch seconds and integer machine/cluster codes for the vectorized (bincount, searchsorted) analyses
+scan_seconds = data['bag_scan_timestamp'].to_numpy().astype('datetime64[s]').astype(np.int64)
+machine_codes, machine_labels = scan_column_codes('scan_machine_id')
+cluster_codes, cluster_labels = scan_column_codes('scan_machine_cluster')
+slot_codes, slot_labels = pd.factorize(data['15_min_interval'], sort=True)
+
+# The vectorized analyses only take scans with a known machine, cluster and timestamp: bincount and lexsort cannot
+# take the -1 code of a missing key, so the other scans are left out, as the grouped counts drop missing keys
+has_machine = (machine_codes >= 0) & (cluster_codes >= 0) & data['bag_scan_timestamp'].notna().to_numpy()
+scan_seconds, machine_codes, cluster_codes, slot_codes = (
+    values[has_machine] for values in (scan_seconds, machine_codes, cluster_codes, slot_codes))
+
+# One machine-then-time order of the scans, shared by the time-out run and machine session analyses
+machine_time_order = np.lexsort((scan_seconds, machine_codes))
+
+seconds_per_day = 24 * 60 * 60
+
+
+# Function to bucket epoch seconds on a grid that starts at midnight of the first day
+def midnight_buckets(timestamps_seconds, bucket_seconds, reference_seconds=None):
+    """
+    Returns the bucket code of every timestamp on a grid of bucket_seconds starting at midnight of the earliest
+    reference timestamp (the timestamps themselves by default), and that midnight in epoch seconds.
+    """
+    reference_seconds = timestamps_seconds if reference_seconds is None else reference_seconds
+    origin_seconds = reference_seconds.min() // seconds_per_day * seconds_per_day
+    return (timestamps_seconds - origin_seconds) // bucket_seconds, origin_seconds
+
+
+# Function to select the scans whose column holds one of the given values
+def scan_selection(column, values):
+    """
+    Returns a NumPy boolean selection vector; missing values are never selected, so the vector is the same for object
+    and Arrow-backed columns and every filter of the scan table can reuse it instead of comparing strings again.
+    """
+    return selection_vector(data, column, values)
+
+
+# Function to convert an Arrow-backed index (or MultiIndex) to NumPy
+def numpy_index(index):
+    """
+    Converts every Arrow-backed level of the index and keeps NumPy-backed indexes as they are.
+    """
+    if isinstance(index, pd.MultiIndex):
+        return pd.MultiIndex.from_arrays(
+            [numpy_index(index.get_level_values(level)) for level in range(index.nlevels)], names=index.names)
+    return pd.Index(numpy_buffer(index), name=index.name) if isinstance(index.dtype, pd.ArrowDtype) else index
+
+
+# Function to hand an aggregate to the charts as NumPy-backed Series or DataFrame
+def numpy_backed(aggregate):
+    """
+    Converts the values, index and columns of an aggregate computed on Arrow-backed columns to NumPy buffers; the
+    aggregates of the default storage are returned unchanged.
+    """
+    if scan_data_dtypes == 'numpy':
+        return aggregate
+    if isinstance(aggregate, pd.DataFrame):
+        return pd.DataFrame({column: numpy_buffer(aggregate[column]) for column in aggregate},
+                            index=numpy_index(aggregate.index)).set_axis(numpy_index(aggregate.columns), axis=1)
+    return pd.Series(numpy_buffer(aggregate), index=numpy_index(aggregate.index), name=aggregate.name)
+
+
+# Selection vectors for the scans counted in the time-out, Level 2, operator intervention and clearance analyses
+is_timeout_scan = scan_selection('scan_machine_result_reason', ['Time out'])
+is_level_2_scan = scan_selection('scan_machine_level', ['Level 2'])
+is_intervention_scan = scan_selection('scan_machine_result', ['Unclear', 'Rejected'])
+is_cleared_scan = scan_selection('scan_machine_result', ['Cleared'])
+
+# The same selections over the scans of the vectorized analyses (see has_machine)
+timeout_flags, level_2_flags, intervention_flags = (
+    selection[has_machine] for selection in (is_timeout_scan, is_level_2_scan, is_intervention_scan))
+
+# Aggregate backend: 'pandas' (default), 'numpy', 'polars', or 'sqlite' and 'duckdb' with their database file next
+# to the CSV; the grouped counts of every backend live in scan_aggregates.py
+scan_data_backend = os.environ.get('SCAN_DATA_BACKEND', 'pandas').lower()
+if scan_data_backend not in aggregate_backends:
+    raise ValueError(f"Unknown SCAN_DATA_BACKEND: {scan_data_backend}")
+if scan_data_backend in optional_backend_modules and optional_backend_modules[scan_data_backend] is None:
+    st.warning(f"SCAN_DATA_BACKEND is '{scan_data_backend}' but the {scan_data_backend} package is not installed; "
+               f"using pandas instead.")
+    scan_data_backend = 'pandas'
+
+# Function to run an aggregate query, cached per backend, database and scan source fingerprint
+@st.cache_data(show_spinner=False)
+def run_aggregate_query(backend, database_path, source_fingerprint, query, parameters):
+    """
+    Cached wrapper around execute_aggregate_query; the source fingerprint (CSV, data source and column storage) is
+    part of the cache key so a changed CSV or configuration is queried afresh.
+    """
+    return execute_aggregate_query(backend, database_path, query, parameters)
+
+
+# Function to run an aggregate query through the cache for the current scan source
+def cached_aggregate_query(backend, database_path, query, parameters):
+    """
+    Passes the scan source fingerprint to run_aggregate_query, with the arguments in the order the backends call it.
+    """
+    return run_aggregate_query(backend, database_path, scan_source_fingerprint, query, parameters)
+
+
+# Function to prepare the data source of a backend once per process
+@st.cache_resource(show_spinner=False)
+def prepared_backend_source(backend, source_key):
+    """
+    Converts the scan table to Polars, or loads it into the SQL database file of the backend and returns its path.
+    st.cache_resource computes each backend and scan source once, holding back concurrent sessions asking for the
+    same backend until it is ready, and shares the result with all of them.
+    """
+    if backend == 'polars':
+        return polars_scan_table(data)
+    database_path = os.path.splitext(file_path)[0] + f'.{scan_data_source}-{scan_data_dtypes}.{backend}'
+    prepare_sql_backend(backend, database_path, scan_source_fingerprint, data)
+    return database_path
+
+
+# Function to return the prepared data source of a backend
+def prepare_backend(backend):
+    """
+    Returns the Polars copy of the scan table or the SQL database path of the backend (nothing for pandas and
+    NumPy, which read the frame directly), preparing it on first use so backends that are never queried cost nothing.
+    """
+    if backend in ('pandas', 'numpy'):
+        return None
+    return prepared_backend_source(backend, scan_source_key)
+
+
+# Function to return a chapter aggregate from a backend in the shape the chapters use
+def chapter_aggregate(name, backend=None, cached=True):
+    """
+    Evaluates the named aggregate on the configured (or given) backend, names the index as the chapter expects and
+    unstacks two-key aggregates into a table. Cached aggregates are computed once per process and shared by all
+    sessions; the parity check passes cached=False to time the backend itself.
+    """
+    backend = backend or scan_data_backend
+
+    def evaluate():
+        run_query = cached_aggregate_query if cached else execute_aggregate_query
+        return numpy_backed(evaluate_chapter_aggregate(name, backend, data, prepare_backend(backend), run_query))
+
+    return shared_data_product(f'{name} ({backend})', scan_source_key, evaluate) if cached else evaluate()
+
 
 # Aggregate data for visualizations
-throughput_by_day = data.groupby('day').size()
-throughput_by_hour = data.groupby('hour').size()
-throughput_by_15_min = data.groupby('15_min_interval').size()
+throughput_by_day = chapter_aggregate('throughput_by_day')
+throughput_by_hour = chapter_aggregate('throughput_by_hour')
+throughput_by_15_min = chapter_aggregate('throughput_by_15_min')
 
 # Plot throughput by day
 fig_throughput_day = px.bar(
@@ -220,21 +574,14 @@ st.markdown(f"""
 # Top 6 busiest days
 top_6_days = throughput_by_day.sort_values(ascending=False).head(6)
 
-# Calculate statistics for top 6 busiest days
-mean_throughput = throughput_by_day.mean()
-std_throughput = throughput_by_day.std()
-variance_throughput = throughput_by_day.var()
-
-# Calculate confidence interval for the mean (95% confidence level)
-n = len(throughput_by_day)  # Number of days
-standard_error = std_throughput / (n ** 0.5)  # Standard error of the mean
+# Calculate statistics and the confidence interval for the mean (95% confidence level)
 confidence_level = 0.95  # 95% confidence interval
-degrees_of_freedom = n - 1
-critical_value = stats.t.ppf((1 + confidence_level) / 2, df=degrees_of_freedom)  # t-critical value
-
-margin_of_error = critical_value * standard_error  # Margin of error
-ci_lower = mean_throughput - margin_of_error  # Lower bound of the confidence interval
-ci_upper = mean_throughput + margin_of_error  # Upper bound of the confidence interval
+throughput_by_day_ci = grouped_mean_confidence_interval(throughput_by_day.values, confidence_level=confidence_level)
+mean_throughput = throughput_by_day_ci.loc[0, 'mean']
+std_throughput = throughput_by_day_ci.loc[0, 'std']
+variance_throughput = std_throughput ** 2
+ci_lower = throughput_by_day_ci.loc[0, 'ci_lower']  # Lower bound of the confidence interval
+ci_upper = throughput_by_day_ci.loc[0, 'ci_upper']  # Upper bound of the confidence interval
 
 # Assign colors dynamically based on rank
 red_gradient = [
@@ -386,21 +733,13 @@ top_6_hours = throughput_by_hour.sort_values(ascending=False).head(6)
 # Plot throughput by hour
 st.write("### Throughput by Hour with Top 6 Highlighted")
 
-# Calculate statistics for top 6 busiest days
-mean_throughput_hour = throughput_by_hour.mean()
-std_throughput_hour = throughput_by_hour.std()
-variance_throughput_hour = throughput_by_hour.var()
-
-# Calculate confidence interval for the mean (95% confidence level)
-n_hour = len(throughput_by_hour)  # Number of days
-standard_error_hour = std_throughput_hour / (n_hour ** 0.5)  # Standard error of the mean
-confidence_level_hour = 0.95  # 95% confidence interval
-degrees_of_freedom_hour = n_hour - 1
-critical_value_hour = stats.t.ppf((1 + confidence_level_hour) / 2, df=degrees_of_freedom_hour)  # t-critical value
-
-margin_of_error_hour = critical_value_hour * standard_error_hour  # Margin of error
-ci_lower_hour = mean_throughput_hour - margin_of_error_hour  # Lower bound of the confidence interval
-ci_upper_hour = mean_throughput_hour + margin_of_error_hour  # Upper bound of the confidence interval
+# Calculate statistics and the confidence interval for the mean (95% confidence level)
+throughput_by_hour_ci = grouped_mean_confidence_interval(throughput_by_hour.values, confidence_level=confidence_level)
+mean_throughput_hour = throughput_by_hour_ci.loc[0, 'mean']
+std_throughput_hour = throughput_by_hour_ci.loc[0, 'std']
+variance_throughput_hour = std_throughput_hour ** 2
+ci_lower_hour = throughput_by_hour_ci.loc[0, 'ci_lower']  # Lower bound of the confidence interval
+ci_upper_hour = throughput_by_hour_ci.loc[0, 'ci_upper']  # Upper bound of the confidence interval
 
 # Assign a color gradient for the top 6 busiest hours
 orange_gradient = [
@@ -711,6 +1050,227 @@ for idx, (interval, count) in enumerate(top_6_intervals.items()):
         with [col4, col5, col6][idx - 3]:  # Place in the second row
             st.markdown(metric_html, unsafe_allow_html=True)
 
+# Peak Sustained Throughput in Sliding Windows
+st.write("### Peak Sustained Throughput in Sliding Windows")
+st.write(" - What is the highest number of bags processed in any N-minute window, including windows that straddle "
+         "the fixed 15-minute interval edges?")
+
+# Window sizes (in minutes) evaluated at once
+sliding_window_minutes = [5, 15, 30, 60]
+
+
+# Function to find the busiest sliding window of each group
+def sliding_window_peaks(timestamps_seconds, group_codes, group_labels, window_minutes):
+    """
+    Counts the scans in the window starting at every scan with searchsorted over group-sorted timestamps and returns
+    the highest count and the start of that window for each group and window size.
+    """
+    order = np.lexsort((timestamps_seconds, group_codes))
+    sorted_seconds = timestamps_seconds[order]
+    sorted_groups = group_codes[order]
+
+    # Offsetting each group by more than the data span keeps windows from crossing into the next group
+    group_span = sorted_seconds.max() - sorted_seconds.min() + max(window_minutes) * 60 + 1
+    keys = sorted_groups * group_span + (sorted_seconds - sorted_seconds.min())
+    group_first = np.searchsorted(sorted_groups, np.arange(len(group_labels)))
+
+    peaks = []
+    for minutes in window_minutes:
+        counts = np.searchsorted(keys, keys + minutes * 60, side='left') - np.arange(len(keys))
+
+        # After sorting by group and descending count, the first row of each group holds its peak
+        best = np.lexsort((-counts, sorted_groups))[group_first]
+        peaks.append(pd.DataFrame({
+            'group': group_labels,
+            'window_minutes': minutes,
+            'peak_bags': counts[best],
+            'peak_bags_per_hour': counts[best] * 60 / minutes,
+            'window_start': pd.to_datetime(sorted_seconds[best], unit='s')
+        }))
+    return pd.concat(peaks, ignore_index=True)
+
+
+# Peaks per machine, cluster and the whole terminal, computed once per process and scan source
+machine_window_peaks, cluster_window_peaks, terminal_window_peaks = shared_data_product(
+    'sliding_window_peaks', scan_source_key,
+    lambda: (sliding_window_peaks(scan_seconds, machine_codes, machine_labels, sliding_window_minutes),
+             sliding_window_peaks(scan_seconds, cluster_codes, cluster_labels, sliding_window_minutes),
+             sliding_window_peaks(scan_seconds, np.zeros(len(scan_seconds), dtype=np.int64),
+                                  pd.Index(['Terminal 3']), sliding_window_minutes)))
+
+# Peak sustained throughput per machine for every window size
+fig_window_peaks = px.bar(
+    machine_window_peaks,
+    x='group',
+    y='peak_bags_per_hour',
+    color=machine_window_peaks['window_minutes'].astype(str) + ' min',
+    barmode='group',
+    title='Peak Sustained Throughput per Machine (Bags per Hour Equivalent)',
+    labels={'group': 'Machine ID', 'peak_bags_per_hour': 'Bags per Hour', 'color': 'Window'}
+)
+
+fig_window_peaks.update_layout(
+    xaxis=dict(
+        tickangle=0,
+        tickfont=dict(size=xtick_size),
+        title=dict(text='Machine ID', font=dict(size=xlabel_size))
+    ),
+    yaxis=dict(
+        tickfont=dict(size=ytick_size),
+        title=dict(text='Bags per Hour', font=dict(size=ylabel_size))
+    ),
+    width=width,
+    height=height
+)
+
+st.plotly_chart(fig_window_peaks)
+
+# Compare the sliding 15-minute peak with the busiest fixed 15-minute interval
+sliding_15_min_peak = terminal_window_peaks.loc[terminal_window_peaks['window_minutes'] == 15].iloc[0]
+
+st.write("#### Peak Sustained Throughput per Cluster and Terminal")
+st.dataframe(
+    pd.concat([cluster_window_peaks, terminal_window_peaks], ignore_index=True)
+    .rename(columns={'group': 'Cluster', 'window_minutes': 'Window (minutes)', 'peak_bags': 'Peak Bags',
+                     'peak_bags_per_hour': 'Bags per Hour', 'window_start': 'Window Start'})
+    .style.format({'Bags per Hour': '{:.0f}'}),
+    use_container_width=True
+)
+
+st.markdown(f"""
+##### Peak Sustained Throughput Insights
+- **Busiest Fixed 15-Minute Interval:** `{top_6_intervals.index[0]}` with `{top_6_intervals.iloc[0]:,}` bags
+- **Busiest Sliding 15-Minute Window:** starting `{sliding_15_min_peak['window_start']}` with
+`{sliding_15_min_peak['peak_bags']:,}` bags
+
+The sliding window never reports fewer bags than the fixed intervals, and the gap between the two shows how much of
+the true peak straddles interval edges. These sliding-window peaks are the capacity figures to size machines and
+clusters against.
+""")
+
+# Seasonal Baseline Anomaly Detection
+st.write("### Seasonal Baseline Anomaly Detection")
+st.write(" - Which 15-minute slots carry abnormal load or time-out spikes for their machine, weekday and time of day?")
+
+anomaly_score_threshold = 3.5  # Robust z-score above which a slot is flagged
+slots_per_day = 24 * 4
+
+
+# Function to count scans into a dense (machine x day x 15-minute slot) tensor
+def machine_day_slot_tensor(timestamps_seconds, group_codes, n_groups, weights=None):
+    """
+    Counts the scans (or sums the weights) for every group, calendar day and 15-minute slot of the day with one
+    bincount over the flattened index. Returns the tensor and the epoch seconds of midnight on the first day.
+    """
+    slot_index, origin_seconds = midnight_buckets(timestamps_seconds, 15 * 60)
+    day_index, slot_of_day = np.divmod(slot_index, slots_per_day)
+    n_days = day_index.max() + 1
+    flat_index = (group_codes * n_days + day_index) * slots_per_day + slot_of_day
+    tensor = np.bincount(flat_index, weights=weights, minlength=n_groups * n_days * slots_per_day)
+    return tensor.reshape(n_groups, n_days, slots_per_day), origin_seconds
+
+
+# Function to score every cell of the tensor against its group x weekday x slot baseline
+def seasonal_baseline_scores(tensor, day_weekdays):
+    """
+    Takes the median and MAD over all days sharing a weekday, for every group and slot at once, and returns the
+    baseline median and the robust z-score of every cell. The scale is floored at the Poisson standard deviation
+    of the median so slots with a near-constant count do not flag every extra bag.
+    """
+    baseline_median = np.zeros(tensor.shape)
+    baseline_scale = np.zeros(tensor.shape)
+    for weekday in np.unique(day_weekdays):
+        weekday_days = day_weekdays == weekday
+        weekday_median = np.median(tensor[:, weekday_days], axis=1, keepdims=True)
+        weekday_mad = np.median(np.abs(tensor[:, weekday_days] - weekday_median), axis=1, keepdims=True)
+        baseline_median[:, weekday_days] = weekday_median
+        baseline_scale[:, weekday_days] = 1.4826 * weekday_mad
+
+    baseline_scale = np.maximum(baseline_scale, np.sqrt(np.maximum(baseline_median, 1)))
+    return baseline_median, (tensor - baseline_median) / baseline_scale
+
+
+# Function to score every machine, day and slot of every anomaly metric
+def slot_anomaly_scores():
+    """
+    Builds the tensor of every metric, scores it against its seasonal baseline and collects the slots above the
+    anomaly threshold. Returns the flagged slots sorted by score, the score tensor of every metric and the days
+    of the tensor.
+    """
+    anomaly_metrics = {'Throughput': None, 'Time-Outs': timeout_flags}
+    anomaly_frames = []
+    anomaly_scores = {}
+    for metric_label, metric_weights in anomaly_metrics.items():
+        slot_tensor, tensor_origin = machine_day_slot_tensor(scan_seconds, machine_codes, len(machine_labels),
+                                                             weights=metric_weights)
+        tensor_days = pd.to_datetime(tensor_origin + np.arange(slot_tensor.shape[1]) * seconds_per_day, unit='s')
+        slot_median, slot_scores = seasonal_baseline_scores(slot_tensor, tensor_days.weekday.to_numpy())
+        anomaly_scores[metric_label] = slot_scores
+
+        flagged_machine, flagged_day, flagged_slot = np.nonzero(slot_scores > anomaly_score_threshold)
+        anomaly_frames.append(pd.DataFrame({
+            'scan_machine_id': machine_labels[flagged_machine],
+            'slot_start': tensor_days[flagged_day] + pd.to_timedelta(flagged_slot * 15, unit='m'),
+            'metric': metric_label,
+            'observed': slot_tensor[flagged_machine, flagged_day, flagged_slot],
+            'baseline_median': slot_median[flagged_machine, flagged_day, flagged_slot],
+            'score': slot_scores[flagged_machine, flagged_day, flagged_slot]
+        }))
+
+    slot_anomalies = pd.concat(anomaly_frames, ignore_index=True).sort_values(by='score', ascending=False)
+    return slot_anomalies, anomaly_scores, tensor_days
+
+
+# Scores and flagged slots of every metric, computed once per process and scan source
+slot_anomalies, anomaly_scores, tensor_days = shared_data_product('slot_anomaly_scores', scan_source_key,
+                                                                  slot_anomaly_scores)
+
+# Scores of the most recent day, the near-real-time view of every machine against its usual profile
+latest_day_scores = anomaly_scores['Throughput'][:, -1, :]
+fig_latest_scores = px.imshow(
+    latest_day_scores,
+    x=[f'{slot // 4:02d}:{slot % 4 * 15:02d}' for slot in range(slots_per_day)],
+    y=list(machine_labels),
+    labels=dict(x='15-Minute Slot', y='Machine ID', color='Score'),
+    title=f'Throughput Anomaly Scores on {tensor_days[-1].date()}',
+    color_continuous_scale='RdBu_r',
+    color_continuous_midpoint=0,
+    aspect='auto'
+)
+
+fig_latest_scores.update_layout(width=width, height=height)
+
+st.plotly_chart(fig_latest_scores)
+
+# Flagged slots over time
+fig_slot_anomalies = px.scatter(
+    slot_anomalies,
+    x='slot_start',
+    y='scan_machine_id',
+    size='score',
+    color='metric',
+    title='Anomalous 15-Minute Slots per Machine',
+    labels={'slot_start': 'Slot Start', 'scan_machine_id': 'Machine ID', 'metric': 'Metric'},
+    hover_data=['observed', 'baseline_median', 'score']
+)
+
+fig_slot_anomalies.update_layout(width=width, height=height)
+
+st.plotly_chart(fig_slot_anomalies)
+
+st.write("#### Strongest Slot Anomalies")
+st.dataframe(slot_anomalies.head(10).style.format({'baseline_median': '{:.1f}', 'score': '{:.2f}'}),
+             use_container_width=True)
+
+st.markdown(f"""
+##### Seasonal Baseline Anomaly Insights
+- **Anomalous Throughput Slots:** `{(slot_anomalies['metric'] == 'Throughput').sum():,}`
+- **Anomalous Time-Out Slots:** `{(slot_anomalies['metric'] == 'Time-Outs').sum():,}`
+
+Unlike the top-6 rankings above, each slot is compared with the same machine, weekday and time of day, so a quiet
+machine's spike is flagged even when it never reaches the terminal-wide peaks.
+""")
+
 st.markdown(f"""## Chapter - 2""")
 
 # Peak Day of Week
@@ -720,7 +1280,7 @@ st.write(
     " - Can operator schedules be optimized to align with peak days to improve system performance and reliability?")
 
 # Group data by week_of_day to calculate throughput
-throughput_by_weekday = data.groupby('week_of_day').size()
+throughput_by_weekday = chapter_aggregate('throughput_by_weekday')
 
 # Sort throughput by days of the week in standard order (Monday to Sunday)
 weekday_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
@@ -733,15 +1293,13 @@ busiest_throughput = throughput_by_weekday.max()
 # Get the top 3 busiest days
 top_3_days = throughput_by_weekday.nlargest(3)
 
-# Calculate mean and standard deviation for the throughput
-mean_throughput = throughput_by_weekday.mean()
-std_throughput = throughput_by_weekday.std()
-n = len(throughput_by_weekday)  # number of days
-
-# Calculate confidence interval bounds (95% CI)
-confidence_interval = 1.96 * (std_throughput / np.sqrt(n))
-upper_bound = mean_throughput + confidence_interval
-lower_bound = mean_throughput - confidence_interval
+# Calculate mean, standard deviation and confidence interval bounds (95% CI) for the throughput
+throughput_by_weekday_ci = grouped_mean_confidence_interval(throughput_by_weekday.values,
+                                                            confidence_level=confidence_level)
+mean_throughput = throughput_by_weekday_ci.loc[0, 'mean']
+std_throughput = throughput_by_weekday_ci.loc[0, 'std']
+upper_bound = throughput_by_weekday_ci.loc[0, 'ci_upper']
+lower_bound = throughput_by_weekday_ci.loc[0, 'ci_lower']
 
 # Create the bar plot with confidence intervals
 fig_week_days = px.bar(
@@ -851,6 +1409,496 @@ on `{top_3_days.index[2]}`, `{top_3_days.index[1]}`, and `{top_3_days.index[0]}`
  ensuring an optimal match between operator availability and screening needs.
 """)
 
+# Heatmaps by Day of Week, Day, Machine and Hour
+st.write("### Heatmaps by Day of Week, Day, Machine and Hour")
+st.write(" - When and where are bags, time-outs, Level 2 escalations and operator interventions concentrated?")
+
+
+# Function to build a matrix from two integer codes with a single 2-D bincount
+def bincount_2d(row_codes, column_codes, n_rows, n_columns, weights=None):
+    """
+    Counts the scans (or sums the weights) for every pair of row and column codes into an n_rows x n_columns
+    matrix with one bincount over the flattened index.
+    """
+    return np.bincount(row_codes * n_columns + column_codes, weights=weights,
+                       minlength=n_rows * n_columns).reshape(n_rows, n_columns)
+
+
+# Scan weights of every heatmap metric; throughput counts every scan
+heatmap_metrics = {
+    'Throughput': None,
+    'Time-Outs': timeout_flags,
+    'Level 2 Escalations': level_2_flags,
+    'Operator Interventions': intervention_flags
+}
+
+
+# Function to count every heatmap metric by every row dimension and hour of day
+def heatmap_matrices():
+    """
+    Returns the row names of every row dimension and the (row x hour) matrix of every metric and row dimension,
+    each from a single 2-D bincount; the hour of day is the column code for every heatmap.
+    """
+    weekday_codes = data['bag_scan_timestamp'].dt.weekday.to_numpy()[has_machine]
+    day_codes, day_labels = pd.factorize(data['day'], sort=True)
+    day_codes = day_codes[has_machine]
+    hour_codes = data['hour'].to_numpy()[has_machine]
+    heatmap_rows = {
+        'Day of Week': (weekday_codes, weekday_order),
+        'Day': (day_codes, [str(day) for day in day_labels]),
+        'Machine': (machine_codes, list(machine_labels))
+    }
+    row_names = {row_label: names for row_label, (_, names) in heatmap_rows.items()}
+    matrices = {(metric_label, row_label): bincount_2d(row_codes, hour_codes, len(names), 24, weights=metric_weights)
+                for metric_label, metric_weights in heatmap_metrics.items()
+                for row_label, (row_codes, names) in heatmap_rows.items()}
+    return row_names, matrices
+
+
+# Heatmap rows and matrices, computed once per process and scan source
+heatmap_row_names, heatmap_counts = shared_data_product('heatmap_matrices', scan_source_key, heatmap_matrices)
+
+# One tab per metric, each with a heatmap per row dimension
+for heatmap_tab, metric_label in zip(st.tabs(list(heatmap_metrics)), heatmap_metrics):
+    with heatmap_tab:
+        for row_label, row_names in heatmap_row_names.items():
+            heatmap_matrix = heatmap_counts[metric_label, row_label]
+            fig_heatmap = px.imshow(
+                heatmap_matrix,
+                x=list(range(24)),
+                y=row_names,
+                labels=dict(x='Hour', y=row_label, color=metric_label),
+                title=f'{metric_label} by {row_label} and Hour',
+                color_continuous_scale='YlOrRd',
+                aspect='auto'
+            )
+            fig_heatmap.update_layout(
+                xaxis=dict(tickmode='linear', tickfont=dict(size=xtick_size), title=dict(font=dict(size=xlabel_size))),
+                yaxis=dict(tickfont=dict(size=ytick_size), title=dict(font=dict(size=ylabel_size))),
+                width=width,
+                height=height
+            )
+            st.plotly_chart(fig_heatmap)
+
+# Rolling Statistics at 15-Minute, Hourly and Daily Resolution
+st.write("### Rolling Statistics at 15-Minute, Hourly and Daily Resolution")
+st.write(" - How do throughput, time-outs, Level 2 escalations and operator interventions trend at each resolution?")
+
+# Bucket size in seconds and rolling window length in buckets for every resolution
+rolling_resolutions = {
+    '15-Minute': (15 * 60, 8),  # 2-hour window
+    'Hourly': (60 * 60, 24),  # 1-day window
+    'Daily': (24 * 60 * 60, 7)  # 1-week window
+}
+rolling_quantiles = (0.1, 0.9)
+
+
+# Function to compute the rolling statistics of every row of a (series x time) panel
+def rolling_statistics(panel, window, quantiles=rolling_quantiles):
+    """
+    Computes the simple moving average, exponential moving average, rolling standard deviation and rolling
+    quantiles along the time axis of a (series x time) panel. The moving average and standard deviation are
+    differences of cumulative sums, the EMA is a first-order linear filter and the quantiles are taken over a
+    strided window view, so every row is handled in the same vectorized call.
+    """
+    panel = panel.astype(float)
+    n_series, n_periods = panel.shape
+
+    # Window sums of the values and their squares from cumulative sums with a leading zero column
+    cumulative = np.cumsum(np.pad(panel, ((0, 0), (1, 0))), axis=1)
+    cumulative_squares = np.cumsum(np.pad(panel ** 2, ((0, 0), (1, 0))), axis=1)
+    window_sums = cumulative[:, window:] - cumulative[:, :-window]
+    window_square_sums = cumulative_squares[:, window:] - cumulative_squares[:, :-window]
+
+    sma = np.full((n_series, n_periods), np.nan)
+    sma[:, window - 1:] = window_sums / window
+    std = np.full((n_series, n_periods), np.nan)
+    std[:, window - 1:] = np.sqrt(np.maximum(window_square_sums - window_sums ** 2 / window, 0) / (window - 1))
+
+    # Same recursion as pandas ewm(span=window, adjust=False), seeded with the first value of every row
+    alpha = 2 / (window + 1)
+    ema, _ = lfilter([alpha], [1, alpha - 1], panel, axis=1, zi=(1 - alpha) * panel[:, :1])
+
+    statistics = {'value': panel, 'sma': sma, 'ema': ema, 'std': std}
+    window_quantiles = np.quantile(sliding_window_view(panel, window, axis=1), quantiles, axis=-1)
+    for quantile, quantile_values in zip(quantiles, window_quantiles):
+        statistics[f'q{quantile * 100:g}'] = np.full((n_series, n_periods), np.nan)
+        statistics[f'q{quantile * 100:g}'][:, window - 1:] = quantile_values
+
+    return statistics
+
+
+# Function to compute the rolling statistics of every metric, machine and resolution in one call
+def multi_resolution_rolling_statistics(timestamps_seconds, group_codes, group_labels, metrics, resolutions):
+    """
+    Bins the scans into a dense (machine x bucket) matrix for every resolution and metric, adds the all-machines
+    total as the first row and returns the rolling statistics keyed by (resolution, metric), each as a
+    DataFrame indexed by bucket start with one column per series.
+    """
+    series_labels = ['All Machines', *group_labels]
+    results = {}
+
+    for resolution, (bucket_seconds, window) in resolutions.items():
+        bucket_codes, origin_seconds = midnight_buckets(timestamps_seconds, bucket_seconds)
+        n_buckets = bucket_codes.max() + 1
+        bucket_index = pd.to_datetime(origin_seconds + np.arange(n_buckets) * bucket_seconds, unit='s')
+
+        for metric, weights in metrics.items():
+            group_panel = bincount_2d(group_codes, bucket_codes, len(group_labels), n_buckets, weights=weights)
+            panel = np.vstack([group_panel.sum(axis=0), group_panel])
+            results[resolution, metric] = {
+                name: pd.DataFrame(values.T, index=bucket_index, columns=series_labels)
+                for name, values in rolling_statistics(panel, window).items()
+            }
+
+    return results
+
+
+# Rolling statistics of every metric, machine and resolution, computed once per process and scan source
+rolling_stats = shared_data_product('rolling_statistics', scan_source_key, lambda: multi_resolution_rolling_statistics(
+    scan_seconds, machine_codes, machine_labels, heatmap_metrics, rolling_resolutions))
+
+# One tab per resolution with the all-machines series, its moving averages and its rolling quantile band
+for rolling_tab, (resolution, (_, window)) in zip(st.tabs(list(rolling_resolutions)), rolling_resolutions.items()):
+    with rolling_tab:
+        fig_rolling = make_subplots(rows=len(heatmap_metrics), cols=1, shared_xaxes=True,
+                                    subplot_titles=list(heatmap_metrics))
+        for row, metric_label in enumerate(heatmap_metrics, start=1):
+            metric_stats = rolling_stats[resolution, metric_label]
+            lower, upper = (metric_stats[f'q{quantile * 100:g}']['All Machines'] for quantile in rolling_quantiles)
+            fig_rolling.add_scatter(x=upper.index, y=upper, mode='lines', line=dict(width=0),
+                                    showlegend=False, row=row, col=1)
+            fig_rolling.add_scatter(x=lower.index, y=lower, mode='lines', line=dict(width=0), fill='tonexty',
+                                    fillcolor='rgba(255, 165, 0, 0.2)', name='Rolling 10-90% Band',
+                                    showlegend=row == 1, row=row, col=1)
+            fig_rolling.add_scatter(x=metric_stats['value'].index, y=metric_stats['value']['All Machines'],
+                                    mode='lines', line=dict(color='lightgray'), name='Count',
+                                    showlegend=row == 1, row=row, col=1)
+            fig_rolling.add_scatter(x=metric_stats['sma'].index, y=metric_stats['sma']['All Machines'],
+                                    mode='lines', line=dict(color='blue', dash='dash'), name=f'{window}-Period SMA',
+                                    showlegend=row == 1, row=row, col=1)
+            fig_rolling.add_scatter(x=metric_stats['ema'].index, y=metric_stats['ema']['All Machines'],
+                                    mode='lines', line=dict(color='green', dash='dot'), name=f'{window}-Period EMA',
+                                    showlegend=row == 1, row=row, col=1)
+        fig_rolling.update_layout(
+            title=f'{resolution} Rolling Statistics (All Machines)',
+            width=width,
+            height=height * 2
+        )
+        st.plotly_chart(fig_rolling)
+
+# Hourly Throughput Forecasts
+st.write("### Hourly Throughput Forecasts")
+st.write(" - How many bags should the terminal, each cluster and each machine expect per hour over the next day "
+         "and week?")
+
+forecast_season_length = 24  # Hours in the daily cycle
+forecast_horizon = 24 * 7  # Next week, of which the first 24 hours are the next day
+forecast_interval_level = 0.95
+holt_winters_grid = {
+    'alpha': [0.05, 0.1, 0.2, 0.4],
+    'beta': [0.0, 0.01, 0.05],
+    'gamma': [0.05, 0.1, 0.3]
+}
+
+
+# Function to fingerprint a DataFrame so cached results are reused only for identical data
+def data_fingerprint(frame):
+    """
+    Returns a hashable fingerprint of a DataFrame's values, index and column names.
+    """
+    return int(pd.util.hash_pandas_object(frame, index=True).sum()), tuple(frame.columns)
+
+
+# Function to run additive Holt-Winters over every row of a (series x time) panel at once
+def holt_winters_filter(panel, alpha, beta, gamma, season_length):
+    """
+    Runs the additive Holt-Winters recursions for all rows together, each row with its own smoothing parameters.
+    The level and trend start from the first two seasons and the seasonal state is indexed by phase. Returns
+    the one-step-ahead errors and the final level, trend and seasonal states.
+    """
+    n_rows, n_periods = panel.shape
+    first_season = panel[:, :season_length]
+    level = first_season.mean(axis=1)
+    trend = (panel[:, season_length:2 * season_length].mean(axis=1) - level) / season_length
+    seasonal = first_season - level[:, None]
+    errors = np.zeros((n_rows, n_periods))
+
+    for period in range(n_periods):
+        phase = period % season_length
+        observed = panel[:, period]
+        errors[:, period] = observed - (level + trend + seasonal[:, phase])
+        new_level = alpha * (observed - seasonal[:, phase]) + (1 - alpha) * (level + trend)
+        trend = beta * (new_level - level) + (1 - beta) * trend
+        seasonal[:, phase] = gamma * (observed - new_level) + (1 - gamma) * seasonal[:, phase]
+        level = new_level
+
+    return errors, level, trend, seasonal
+
+
+# Function to fit seasonal naive and Holt-Winters models to every series, cached per data fingerprint
+@st.cache_data(show_spinner=False)
+def fit_hourly_forecast_models(fingerprint, _panel, season_length, parameter_grid):
+    """
+    Grid-searches the Holt-Winters smoothing parameters by repeating every series once per parameter combination
+    and running a single batched filter, then keeps the combination with the lowest in-sample squared error
+    after the first season. The panel is passed unhashed; the fingerprint keys the cache so reruns on the same
+    data reuse the fitted parameters and final states.
+    """
+    n_series, n_periods = _panel.shape
+    combinations = np.array(np.meshgrid(*parameter_grid.values(), indexing='ij')).reshape(len(parameter_grid), -1).T
+    n_combinations = len(combinations)
+    parameters = np.tile(combinations, (n_series, 1))
+
+    errors, level, trend, seasonal = holt_winters_filter(
+        np.repeat(_panel, n_combinations, axis=0), parameters[:, 0], parameters[:, 1], parameters[:, 2],
+        season_length
+    )
+    squared_errors = (errors[:, season_length:] ** 2).sum(axis=1).reshape(n_series, n_combinations)
+    best = np.arange(n_series) * n_combinations + squared_errors.argmin(axis=1)
+
+    return {
+        'alpha': parameters[best, 0],
+        'beta': parameters[best, 1],
+        'gamma': parameters[best, 2],
+        'level': level[best],
+        'trend': trend[best],
+        'seasonal': seasonal[best],
+        'holt_winters_sigma': np.sqrt(squared_errors.min(axis=1) / (n_periods - season_length)),
+        'last_season': _panel[:, -season_length:],
+        'seasonal_naive_sigma': np.std(_panel[:, season_length:] - _panel[:, :-season_length], axis=1)
+    }
+
+
+# Function to turn the fitted models into hourly forecasts with prediction intervals
+def hourly_forecasts(fitted, series_labels, last_period, n_periods, season_length, horizon, interval_level):
+    """
+    Produces the seasonal naive and Holt-Winters forecasts for the next horizon hours of every series with
+    normal prediction intervals, widening per completed season for seasonal naive and with the Holt-Winters
+    error-propagation weights. Forecasts and lower bounds are clipped at zero bags.
+    """
+    steps = np.arange(1, horizon + 1)
+    phases = (n_periods + steps - 1) % season_length
+    critical_value = stats.norm.ppf(0.5 + interval_level / 2)
+
+    seasonal_naive = fitted['last_season'][:, phases]
+    seasonal_naive_margin = (critical_value * fitted['seasonal_naive_sigma'][:, None]
+                             * np.sqrt((steps - 1) // season_length + 1))
+
+    holt_winters = (fitted['level'][:, None] + steps * fitted['trend'][:, None]
+                    + fitted['seasonal'][:, phases])
+    propagation = (fitted['alpha'][:, None] * (1 + steps[:-1] * fitted['beta'][:, None])
+                   + fitted['gamma'][:, None] * (steps[:-1] % season_length == 0))
+    variance_factor = 1 + np.pad(np.cumsum(propagation ** 2, axis=1), ((0, 0), (1, 0)))
+    holt_winters_margin = critical_value * fitted['holt_winters_sigma'][:, None] * np.sqrt(variance_factor)
+
+    forecast_index = last_period + pd.to_timedelta(steps, unit='h')
+    forecast_frames = []
+    for model, point, margin in [('Seasonal Naive', seasonal_naive, seasonal_naive_margin),
+                                 ('Holt-Winters', holt_winters, holt_winters_margin)]:
+        forecast_frames.append(pd.DataFrame({
+            'series': np.repeat(series_labels, horizon),
+            'model': model,
+            'hour': np.tile(forecast_index, len(series_labels)),
+            'forecast': np.clip(point, 0, None).ravel(),
+            'lower': np.clip(point - margin, 0, None).ravel(),
+            'upper': (point + margin).ravel()
+        }))
+
+    return pd.concat(forecast_frames, ignore_index=True)
+
+
+# Function to build the throughput panel of the terminal, every cluster and every machine at one resolution
+def terminal_cluster_machine_throughput(resolution):
+    """
+    Takes the all-machines and per-machine throughput of the rolling statistics engine at the resolution and adds
+    the per-cluster counts on the same buckets, with columns ordered All Machines, clusters, machines.
+    """
+    machine_panel = rolling_stats[resolution, 'Throughput']['value']
+    bucket_codes = midnight_buckets(scan_seconds, rolling_resolutions[resolution][0])[0]
+    cluster_panel = pd.DataFrame(
+        bincount_2d(cluster_codes, bucket_codes, len(cluster_labels), len(machine_panel)).T,
+        index=machine_panel.index, columns=cluster_labels
+    )
+    return pd.concat([machine_panel[['All Machines']], cluster_panel, machine_panel.iloc[:, 1:]], axis=1)
+
+
+# Hourly throughput of the terminal, every cluster and every machine on the rolling statistics engine's buckets
+forecast_series = terminal_cluster_machine_throughput('Hourly')
+
+fitted_forecast_models = fit_hourly_forecast_models(
+    data_fingerprint(forecast_series), forecast_series.to_numpy().T, forecast_season_length, holt_winters_grid
+)
+throughput_forecasts = hourly_forecasts(
+    fitted_forecast_models, forecast_series.columns.to_numpy(), forecast_series.index[-1], len(forecast_series),
+    forecast_season_length, forecast_horizon, forecast_interval_level
+)
+
+# Terminal history for the last week followed by both models' forecasts and intervals
+terminal_forecasts = throughput_forecasts[throughput_forecasts['series'] == 'All Machines']
+fig_forecast = go.Figure()
+fig_forecast.add_scatter(x=forecast_series.index[-forecast_horizon:],
+                         y=forecast_series['All Machines'].iloc[-forecast_horizon:],
+                         mode='lines', name='Observed', line=dict(color='gray'))
+for model, color in [('Seasonal Naive', 'orange'), ('Holt-Winters', 'blue')]:
+    model_forecasts = terminal_forecasts[terminal_forecasts['model'] == model]
+    fig_forecast.add_scatter(x=model_forecasts['hour'], y=model_forecasts['upper'], mode='lines',
+                             line=dict(width=0), showlegend=False)
+    fig_forecast.add_scatter(x=model_forecasts['hour'], y=model_forecasts['lower'], mode='lines',
+                             line=dict(width=0), fill='tonexty', opacity=0.2, name=f'{model} Interval')
+    fig_forecast.add_scatter(x=model_forecasts['hour'], y=model_forecasts['forecast'], mode='lines',
+                             name=model, line=dict(color=color))
+
+fig_forecast.update_layout(
+    title=f'Hourly Throughput Forecast for All Machines ({forecast_interval_level:.0%} Intervals)',
+    xaxis=dict(tickfont=dict(size=xtick_size), title=dict(text='Hour', font=dict(size=xlabel_size))),
+    yaxis=dict(tickfont=dict(size=ytick_size), title=dict(text='Bags', font=dict(size=ylabel_size))),
+    width=width,
+    height=height
+)
+
+st.plotly_chart(fig_forecast)
+
+# Expected bags over the next day and week per series from the Holt-Winters forecasts
+holt_winters_forecasts = throughput_forecasts[throughput_forecasts['model'] == 'Holt-Winters']
+forecast_totals = pd.DataFrame({
+    'Next Day': holt_winters_forecasts.groupby('series', sort=False).head(forecast_season_length)
+    .groupby('series', sort=False)['forecast'].sum(),
+    'Next Week': holt_winters_forecasts.groupby('series', sort=False)['forecast'].sum(),
+    'Busiest Forecast Hour': holt_winters_forecasts.loc[
+        holt_winters_forecasts.groupby('series', sort=False)['forecast'].idxmax(), ['series', 'hour']
+    ].set_index('series')['hour']
+})
+
+st.write("#### Forecast Bags per Terminal, Cluster and Machine (Holt-Winters)")
+st.dataframe(forecast_totals.style.format({'Next Day': '{:,.0f}', 'Next Week': '{:,.0f}'}),
+             use_container_width=True)
+
+st.markdown(f"""
+##### Hourly Throughput Forecast Insights
+- **Forecast Bags Tomorrow (All Machines):** `{forecast_totals.loc['All Machines', 'Next Day']:,.0f}`
+- **Forecast Bags Next Week (All Machines):** `{forecast_totals.loc['All Machines', 'Next Week']:,.0f}`
+- **Busiest Forecast Hour (All Machines):** `{forecast_totals.loc['All Machines', 'Busiest Forecast Hour']}`
+
+Staffing can be planned against these forecasts and their upper bounds rather than against past peaks alone.
+""")
+
+# Seasonal Decomposition of 15-Minute Throughput
+st.write("### Seasonal Decomposition of 15-Minute Throughput")
+st.write(" - Once the daily and weekly rhythm is removed, which 15-minute intervals are genuine operational incidents?")
+
+daily_season_length = 24 * 4  # 15-minute intervals per day
+weekly_season_length = 7 * daily_season_length
+decomposition_iterations = 2
+residual_incident_threshold = 3.5  # Robust z-score of the residual above which an interval is an incident
+
+
+# Function to take a centred moving average along the time axis of every row with cumulative sums
+def centred_moving_average(panel, window):
+    """
+    Averages every row over a window centred on each period, shrinking the window at both edges so the trend
+    covers the whole series.
+    """
+    n_periods = panel.shape[1]
+    cumulative = np.cumsum(np.pad(panel, ((0, 0), (1, 0))), axis=1)
+    window_start = np.clip(np.arange(n_periods) - window // 2, 0, n_periods)
+    window_end = np.clip(np.arange(n_periods) + window - window // 2, 0, n_periods)
+    return (cumulative[:, window_end] - cumulative[:, window_start]) / (window_end - window_start)
+
+
+# Function to take the median of every seasonal phase of every row, centred to sum to zero over a season
+def seasonal_phase_median(panel, season_length):
+    """
+    Pads every row to whole seasons, reshapes it to (row x season x phase) and takes the median over the seasons,
+    so each phase's profile is robust to the incidents the residual is meant to expose.
+    """
+    n_series, n_periods = panel.shape
+    n_seasons = -(-n_periods // season_length)
+    padded = np.pad(panel, ((0, 0), (0, n_seasons * season_length - n_periods)), constant_values=np.nan)
+    profile = np.nanmedian(padded.reshape(n_series, n_seasons, season_length), axis=1)
+    profile = profile - profile.mean(axis=1, keepdims=True)
+    return profile[:, np.arange(n_periods) % season_length]
+
+
+# Function to decompose every series into trend, daily and weekly seasonality and residual, cached on disk
+@st.cache_data(persist='disk', show_spinner=False)
+def decompose_15_min_throughput(fingerprint, _panel, iterations=decomposition_iterations):
+    """
+    STL-style backfitting on all rows at once: the trend is a one-day centred moving average of the
+    deseasonalized series and each seasonal component is the phase median of what the trend and the other
+    component leave behind. The weekly component is only fitted with at least two full weeks of data. Results
+    are persisted to disk per data fingerprint so reruns and restarts skip the decomposition.
+    """
+    panel = _panel.astype(float)
+    daily = np.zeros(panel.shape)
+    weekly = np.zeros(panel.shape)
+
+    for _ in range(iterations):
+        trend = centred_moving_average(panel - daily - weekly, daily_season_length)
+        daily = seasonal_phase_median(panel - trend - weekly, daily_season_length)
+        if panel.shape[1] >= 2 * weekly_season_length:
+            weekly = seasonal_phase_median(panel - trend - daily, weekly_season_length)
+
+    return {'trend': trend, 'daily': daily, 'weekly': weekly, 'residual': panel - trend - daily - weekly}
+
+
+# 15-minute throughput of the terminal, every cluster and every machine on the rolling statistics engine's buckets
+decomposition_series = terminal_cluster_machine_throughput('15-Minute')
+throughput_decomposition = {
+    component: pd.DataFrame(values.T, index=decomposition_series.index, columns=decomposition_series.columns)
+    for component, values in decompose_15_min_throughput(
+        data_fingerprint(decomposition_series), decomposition_series.to_numpy().T).items()
+}
+
+# Incidents are intervals whose residual is far outside the series' usual residual spread
+decomposition_residuals = throughput_decomposition['residual']
+residual_scale = 1.4826 * (decomposition_residuals - decomposition_residuals.median()).abs().median()
+residual_scores = decomposition_residuals / residual_scale.where(residual_scale > 0, 1)
+residual_incidents = residual_scores.abs().gt(residual_incident_threshold)
+residual_incident_summary = pd.DataFrame({
+    'Incident Intervals': residual_incidents.sum(),
+    'Largest Residual (Bags)': decomposition_residuals.abs().max(),
+    'Largest Residual At': decomposition_residuals.abs().idxmax()
+})
+
+# Observed series and its components for the whole terminal
+decomposition_components = {'Observed': decomposition_series, 'Trend': throughput_decomposition['trend'],
+                            'Daily Seasonality': throughput_decomposition['daily'],
+                            'Weekly Seasonality': throughput_decomposition['weekly'],
+                            'Residual': decomposition_residuals}
+fig_decomposition = make_subplots(rows=len(decomposition_components), cols=1, shared_xaxes=True,
+                                  subplot_titles=list(decomposition_components))
+for row, (component_label, component) in enumerate(decomposition_components.items(), start=1):
+    fig_decomposition.add_scatter(x=component.index, y=component['All Machines'], mode='lines',
+                                  name=component_label, showlegend=False, row=row, col=1)
+terminal_incidents = residual_incidents.index[residual_incidents['All Machines']]
+fig_decomposition.add_scatter(x=terminal_incidents, y=decomposition_residuals.loc[terminal_incidents, 'All Machines'],
+                              mode='markers', marker=dict(color='red'), name='Incident',
+                              row=len(decomposition_components), col=1)
+
+fig_decomposition.update_layout(
+    title='Decomposition of 15-Minute Throughput (All Machines)',
+    width=width,
+    height=height * 2
+)
+
+st.plotly_chart(fig_decomposition)
+
+st.write("#### Residual Incidents per Terminal, Cluster and Machine")
+st.dataframe(residual_incident_summary.style.format({'Largest Residual (Bags)': '{:.1f}'}),
+             use_container_width=True)
+
+st.markdown(f"""
+##### Seasonal Decomposition Insights
+- **Incident Intervals (All Machines):** `{residual_incident_summary.loc['All Machines', 'Incident Intervals']:,}` of
+`{len(decomposition_series):,}` 15-minute intervals
+- **Largest Terminal Residual:** `{residual_incident_summary.loc['All Machines', 'Largest Residual (Bags)']:.1f}` bags
+at `{residual_incident_summary.loc['All Machines', 'Largest Residual At']}`
+
+The residual is what remains after the daily and weekly rhythm and the slow trend, so spikes and drops in it point
+to operational incidents rather than ordinary busy periods.
+""")
+
 st.markdown(f"""## Chapter - 3""")
 
 st.markdown(f"""### System Bottlenecks and Time-Outs""")
@@ -860,9 +1908,9 @@ st.write("- During which days are time-outs most prevalent?")
 st.write("- During which times are time-outs most prevalent?")
 
 # Data Manipulation for "Time Out" Section
-timeout_data = data[data['scan_machine_result_reason'] == 'Time out']
+timeout_data = shared_data_product('timeout_data', scan_source_key, lambda: data[is_timeout_scan])
 timeout_percentage = (len(timeout_data) / len(data)) * 100
-timeout_by_day = timeout_data.groupby('day').size()
+timeout_by_day = timeout_data.groupby('day', observed=True).size()
 timeout_by_hour = timeout_data.groupby('hour').size()
 
 # Group by machine and cluster to calculate percentages
@@ -1105,10 +2153,10 @@ for idx, (hour, count) in enumerate(top_6_timeout_hours.items()):
             st.markdown(metric_html, unsafe_allow_html=True)
 
 # Filter the data for "Time Out" cases
-timeout_data = data[data['scan_machine_result_reason'] == 'Time out']
+timeout_data = shared_data_product('timeout_data', scan_source_key, lambda: data[is_timeout_scan])
 
 # Group by scan_machine_id to get counts of time-out cases per machine
-timeout_by_machine = timeout_data.groupby('scan_machine_id').size()
+timeout_by_machine = chapter_aggregate('timeout_by_machine')
 
 # Calculate the percentage of time-outs for each machine
 total_cases_by_machine = data.groupby('scan_machine_id').size()
@@ -1119,6 +2167,14 @@ timeout_df = timeout_percentage_by_machine.reset_index()
 timeout_df.columns = ['scan_machine_id', 'timeout_percentage']
 timeout_df = timeout_df.sort_values(by='timeout_percentage', ascending=False).round(2)
 
+# 95% Wilson interval for each machine's time-out percentage
+timeout_rate_ci = proportion_confidence_interval(
+    timeout_by_machine.reindex(timeout_df['scan_machine_id']).fillna(0).values,
+    total_cases_by_machine.reindex(timeout_df['scan_machine_id']).values
+)
+timeout_df['ci_lower'] = (timeout_rate_ci['ci_lower'] * 100).round(2).values
+timeout_df['ci_upper'] = (timeout_rate_ci['ci_upper'] * 100).round(2).values
+
 #  Get top machine by timeout percentage
 peak_machine_by_timeout_percentage = timeout_df.head(1)  #
 
@@ -1135,7 +2191,9 @@ fig = px.bar(
     labels={'scan_machine_id': 'Machine', 'timeout_percentage': 'Time-Out Percentage (%)'},
     text='timeout_percentage',
     color='timeout_percentage',
-    color_continuous_scale='Viridis'
+    color_continuous_scale='Viridis',
+    error_y=timeout_df['ci_upper'] - timeout_df['timeout_percentage'],
+    error_y_minus=timeout_df['timeout_percentage'] - timeout_df['ci_lower']
 )
 
 fig.update_layout(
@@ -1218,6 +2276,163 @@ Yes, the analysis indicates that certain machines exhibit a higher propensity fo
     we can enhance the reliability of Machine 7 and improve overall workflow efficiency.
 """)
 
+# Time-Out Bursts and Likely Outages
+st.write("### Time-Out Bursts and Likely Outages")
+st.write(" - Are time-outs a steady trickle, or do machines time out many times in a row?")
+
+# Runs of at least this many consecutive time-outs on one machine are flagged as likely outages
+outage_min_run_length = 10
+
+# Machine-sorted scan stream with a time-out flag per scan
+ordered_machine_codes = machine_codes[machine_time_order]
+ordered_seconds = scan_seconds[machine_time_order]
+ordered_is_timeout = timeout_flags[machine_time_order]
+
+# Run-length encoding: a run starts at a time-out that follows a non-time-out or the first scan of a machine
+ordered_new_machine = np.diff(ordered_machine_codes, prepend=-1) != 0
+previous_is_timeout = np.append(False, ordered_is_timeout[:-1])
+timeout_run_start = ordered_is_timeout & (~previous_is_timeout | ordered_new_machine)
+timeout_run_ids = np.cumsum(timeout_run_start) - 1
+timeout_run_lengths = np.bincount(timeout_run_ids[ordered_is_timeout], minlength=timeout_run_start.sum())
+timeout_run_first = np.flatnonzero(timeout_run_start)
+timeout_run_last = timeout_run_first + timeout_run_lengths - 1
+
+timeout_runs = pd.DataFrame({
+    'scan_machine_id': machine_labels[ordered_machine_codes[timeout_run_first]],
+    'start': pd.to_datetime(ordered_seconds[timeout_run_first], unit='s'),
+    'end': pd.to_datetime(ordered_seconds[timeout_run_last], unit='s'),
+    'consecutive_timeouts': timeout_run_lengths,
+    'duration_minutes': (ordered_seconds[timeout_run_last] - ordered_seconds[timeout_run_first]) / 60
+})
+timeout_runs['likely_outage'] = timeout_runs['consecutive_timeouts'] >= outage_min_run_length
+
+# Bursts are runs of two or more consecutive time-outs
+timeout_bursts = timeout_runs[timeout_runs['consecutive_timeouts'] > 1].sort_values(
+    by='consecutive_timeouts', ascending=False)
+timeout_outages = timeout_runs[timeout_runs['likely_outage']]
+share_of_timeouts_in_bursts = timeout_bursts['consecutive_timeouts'].sum() / timeout_run_lengths.sum() * 100
+
+# Timeline of time-out bursts per machine
+fig_timeout_bursts = px.scatter(
+    timeout_bursts,
+    x='start',
+    y='scan_machine_id',
+    size='consecutive_timeouts',
+    color='likely_outage',
+    title='Time-Out Bursts per Machine',
+    labels={'start': 'Burst Start', 'scan_machine_id': 'Machine ID', 'likely_outage': 'Likely Outage'},
+    hover_data=['end', 'consecutive_timeouts', 'duration_minutes'],
+    color_discrete_map={True: 'red', False: 'orange'}
+)
+
+fig_timeout_bursts.update_layout(
+    xaxis=dict(
+        tickfont=dict(size=xtick_size),
+        title=dict(text='Burst Start', font=dict(size=xlabel_size))
+    ),
+    yaxis=dict(
+        tickfont=dict(size=ytick_size),
+        title=dict(text='Machine ID', font=dict(size=ylabel_size))
+    ),
+    width=width,
+    height=height
+)
+
+st.plotly_chart(fig_timeout_bursts)
+
+st.write("#### Longest Time-Out Bursts")
+st.dataframe(timeout_bursts.head(10).style.format({'duration_minutes': '{:.1f}'}), use_container_width=True)
+
+st.markdown(f"""
+##### Time-Out Bursts Insights
+- **Time-Out Bursts (2 or more in a row):** `{len(timeout_bursts):,}`
+- **Share of Time-Outs Occurring in Bursts:** `{share_of_timeouts_in_bursts:.2f}%`
+- **Likely Outages (`{outage_min_run_length}` or more in a row):** `{len(timeout_outages):,}`
+- **Longest Burst:** `{timeout_runs['consecutive_timeouts'].max():,}` consecutive time-outs on
+`{timeout_runs.loc[timeout_runs['consecutive_timeouts'].idxmax(), 'scan_machine_id']}`
+
+Isolated time-outs point to individual difficult bags, while long runs on one machine point to an equipment or
+connectivity outage that should be escalated to maintenance.
+""")
+
+# Cross-Machine Correlated Time-Outs
+st.write("### Cross-Machine Correlated Time-Outs")
+st.write(" - Are time-outs local to one machine, or do several machines time out at the same time?")
+
+# Short time windows, and how many machines must time out together (across clusters) to count as system-wide
+correlated_window_minutes = 5
+system_wide_min_machines = 3
+
+# Bucket the time-out scans into short windows aligned to midnight of the first day
+correlated_window_seconds = correlated_window_minutes * 60
+timeout_windows, correlated_origin = midnight_buckets(scan_seconds[timeout_flags], correlated_window_seconds,
+                                                      reference_seconds=scan_seconds)
+n_timeout_windows = timeout_windows.max() + 1
+
+# 2-D (window x machine) and (window x cluster) counts from a single bincount each
+window_machine_timeouts = bincount_2d(timeout_windows, machine_codes[timeout_flags],
+                                      n_timeout_windows, len(machine_labels))
+window_cluster_timeouts = bincount_2d(timeout_windows, cluster_codes[timeout_flags],
+                                      n_timeout_windows, len(cluster_labels))
+
+# Windows with at least one time-out, and how many distinct machines and clusters were affected
+active_windows = np.flatnonzero(window_machine_timeouts.sum(axis=1))
+correlated_timeouts = pd.DataFrame({
+    'window_start': pd.to_datetime(correlated_origin + active_windows * correlated_window_seconds, unit='s'),
+    'timeouts': window_machine_timeouts[active_windows].sum(axis=1),
+    'machines_timed_out': (window_machine_timeouts[active_windows] > 0).sum(axis=1),
+    'clusters_timed_out': (window_cluster_timeouts[active_windows] > 0).sum(axis=1)
+})
+correlated_timeouts['system_wide'] = ((correlated_timeouts['machines_timed_out'] >= system_wide_min_machines) &
+                                      (correlated_timeouts['clusters_timed_out'] > 1))
+system_wide_timeouts = correlated_timeouts[correlated_timeouts['system_wide']]
+machines_per_timeout_window = correlated_timeouts['machines_timed_out'].value_counts().sort_index()
+
+# Distribution of the number of machines timing out in the same window
+fig_correlated_timeouts = px.bar(
+    machines_per_timeout_window,
+    x=machines_per_timeout_window.index,
+    y=machines_per_timeout_window.values,
+    title=f'Machines Timing Out in the Same {correlated_window_minutes}-Minute Window',
+    labels={'x': 'Machines Timing Out Together', 'y': 'Number of Windows'}
+)
+
+fig_correlated_timeouts.update_traces(marker=dict(color='red'), text=machines_per_timeout_window.values,
+                                      textposition='outside')
+
+fig_correlated_timeouts.update_layout(
+    xaxis=dict(
+        tickmode='linear',
+        tickangle=0,
+        tickfont=dict(size=xtick_size),
+        title=dict(text='Machines Timing Out Together', font=dict(size=xlabel_size))
+    ),
+    yaxis=dict(
+        tickfont=dict(size=ytick_size),
+        title=dict(text='Number of Windows', font=dict(size=ylabel_size))
+    ),
+    width=width,
+    height=height
+)
+
+st.plotly_chart(fig_correlated_timeouts)
+
+st.write("#### System-Wide Time-Out Events")
+st.dataframe(system_wide_timeouts.sort_values(by='machines_timed_out', ascending=False).head(10),
+             use_container_width=True)
+
+st.markdown(f"""
+##### Correlated Time-Out Insights
+- **{correlated_window_minutes}-Minute Windows with at Least One Time-Out:** `{len(correlated_timeouts):,}`
+- **Windows with a Single Machine Timing Out:** `{machines_per_timeout_window.get(1, 0):,}`
+- **System-Wide Events (`{system_wide_min_machines}`+ machines across clusters):** `{len(system_wide_timeouts):,}`
+- **Share of Time-Outs During System-Wide Events:**
+`{system_wide_timeouts['timeouts'].sum() / correlated_timeouts['timeouts'].sum() * 100:.2f}%`
+
+Time-outs that hit several machines in different clusters at once point to a shared cause such as the network or the
+conveyor system, rather than to an individual machine.
+""")
+
 st.markdown(f"""## Chapter - 4""")
 
 st.markdown(f"""### Machine and Cluster Utilization""")
@@ -1227,18 +2442,18 @@ st.write(" - Do machines with higher workloads correlate with higher malfunction
 
 # Data Manipulation for Bag Distribution Across Machines Section
 # Bags per machine
-bags_per_machine = data.groupby('scan_machine_id').size()
+bags_per_machine = chapter_aggregate('bags_per_machine')
 
 # Bags per cluster
-bags_per_cluster = data.groupby('scan_machine_cluster').size()
+bags_per_cluster = chapter_aggregate('bags_per_cluster')
 
 # Calculate mean values
 mean_bags_per_machine = bags_per_machine.mean()
 mean_bags_per_cluster = bags_per_cluster.mean()
 
 # Calculate total number of bags per machine and per cluster
-bags_per_machine = data.groupby('scan_machine_id').size()
-bags_per_cluster = data.groupby('scan_machine_cluster').size()
+bags_per_machine = chapter_aggregate('bags_per_machine')
+bags_per_cluster = chapter_aggregate('bags_per_cluster')
 
 # Standard deviation
 std_bags_per_machine = bags_per_machine.std()
@@ -1603,7 +2818,9 @@ conclusion is supported by the observation that the bag count of the top machine
 - Do machines with higher workloads correlate with higher malfunction rates? \n
 Currently, the dataset does not include information on machine malfunctions or error rates, preventing us from 
 drawing any direct conclusions regarding the relationship between higher workloads and malfunction rates. 
-To investigate this correlation further, incorporating machine performance and maintenance data would be beneficial. \n
+To investigate this correlation further, incorporating machine performance and maintenance data would be beneficial.
+The Throughput versus Time-Out Backpressure analysis below uses time-outs and Level 2 escalations as a proxy for
+malfunctions in the meantime. \n
 ##### Additional Observations and Recommendations:
 - Machines with Lower Utilization: \n
 Machines below the low-load threshold (`{int(low_load_threshold_machine)}`) may represent underutilized resources.
@@ -1622,6 +2839,407 @@ Including data points like processing times, maintenance history, and error occu
 the ability to analyze workload impacts on machine performance and identify further optimization opportunities.
 """)
 
+# Throughput versus Time-Out Backpressure
+st.write("### Throughput versus Time-Out Backpressure")
+st.write(" - Do machines with higher workloads correlate with higher time-out and Level 2 rates?")
+
+# Dense (machine x 15-minute slot) panel from the same 15-minute intervals used for throughput
+n_machines_panel = len(machine_labels)
+n_slots_panel = len(slot_labels)
+throughput_panel = bincount_2d(machine_codes, slot_codes, n_machines_panel, n_slots_panel)
+timeout_panel = bincount_2d(machine_codes, slot_codes, n_machines_panel, n_slots_panel, weights=timeout_flags)
+level_2_panel = bincount_2d(machine_codes, slot_codes, n_machines_panel, n_slots_panel, weights=level_2_flags)
+
+# Rates are only defined for slots in which the machine screened at least one bag
+active_panel = throughput_panel > 0
+with np.errstate(invalid='ignore', divide='ignore'):
+    timeout_rate_panel = np.where(active_panel, timeout_panel / throughput_panel, 0.0)
+    level_2_rate_panel = np.where(active_panel, level_2_panel / throughput_panel, 0.0)
+
+
+# Function to correlate two panels row by row
+def rowwise_correlation(x, y, mask):
+    """
+    Computes the Pearson correlation and the least-squares slope of y on x for every row of two panels at once,
+    using only the cells where mask is True.
+    """
+    n = mask.sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        dx = np.where(mask, x - (np.where(mask, x, 0).sum(axis=1) / n)[:, None], 0.0)
+        dy = np.where(mask, y - (np.where(mask, y, 0).sum(axis=1) / n)[:, None], 0.0)
+        covariance = (dx * dy).sum(axis=1)
+        variance_x = (dx ** 2).sum(axis=1)
+        variance_y = (dy ** 2).sum(axis=1)
+        return covariance / np.sqrt(variance_x * variance_y), covariance / variance_x
+
+
+timeout_correlation, timeout_slope = rowwise_correlation(throughput_panel, timeout_rate_panel, active_panel)
+level_2_correlation, level_2_slope = rowwise_correlation(throughput_panel, level_2_rate_panel, active_panel)
+
+backpressure_by_machine = pd.DataFrame({
+    'timeout_rate_correlation': timeout_correlation,
+    'timeout_rate_slope_per_bag': timeout_slope,
+    'level_2_rate_correlation': level_2_correlation,
+    'level_2_rate_slope_per_bag': level_2_slope
+}, index=pd.Index(machine_labels, name='scan_machine_id'))
+
+# Load-versus-failure curve: pooled rates per load decile of the active machine-slots
+active_loads = throughput_panel[active_panel]
+load_edges = np.unique(np.quantile(active_loads, np.linspace(0, 1, 11)))
+load_bins = np.clip(np.searchsorted(load_edges, active_loads, side='right') - 1, 0, len(load_edges) - 2)
+load_bin_bags = np.bincount(load_bins, weights=active_loads, minlength=len(load_edges) - 1)
+load_curve = pd.DataFrame({
+    'load_from': load_edges[:-1],
+    'machine_slots': np.bincount(load_bins, minlength=len(load_edges) - 1),
+    'timeout_rate': np.bincount(load_bins, weights=timeout_panel[active_panel],
+                                minlength=len(load_edges) - 1) / load_bin_bags * 100,
+    'level_2_rate': np.bincount(load_bins, weights=level_2_panel[active_panel],
+                                minlength=len(load_edges) - 1) / load_bin_bags * 100
+})
+
+# Plot the load-versus-failure curve
+fig_load_curve = px.line(
+    load_curve,
+    x='load_from',
+    y=['timeout_rate', 'level_2_rate'],
+    markers=True,
+    title='Time-Out and Level 2 Rates by 15-Minute Machine Load',
+    labels={'load_from': 'Bags per Machine per 15 Minutes (at least)', 'value': 'Rate (%)', 'variable': 'Metric'}
+)
+
+fig_load_curve.update_layout(
+    xaxis=dict(
+        tickfont=dict(size=xtick_size),
+        title=dict(text='Bags per Machine per 15 Minutes (at least)', font=dict(size=xlabel_size))
+    ),
+    yaxis=dict(
+        tickfont=dict(size=ytick_size),
+        title=dict(text='Rate (%)', font=dict(size=ylabel_size))
+    ),
+    width=width,
+    height=height
+)
+
+st.plotly_chart(fig_load_curve)
+
+# Plot the per-machine correlations
+fig_backpressure = px.bar(
+    backpressure_by_machine,
+    x=backpressure_by_machine.index,
+    y=['timeout_rate_correlation', 'level_2_rate_correlation'],
+    barmode='group',
+    title='Correlation of 15-Minute Load with Time-Out and Level 2 Rates per Machine',
+    labels={'x': 'Machine ID', 'value': 'Pearson Correlation', 'variable': 'Metric'}
+)
+
+fig_backpressure.update_layout(
+    xaxis=dict(
+        tickangle=0,
+        tickfont=dict(size=xtick_size),
+        title=dict(text='Machine ID', font=dict(size=xlabel_size))
+    ),
+    yaxis=dict(
+        tickfont=dict(size=ytick_size),
+        title=dict(text='Pearson Correlation', font=dict(size=ylabel_size))
+    ),
+    width=width,
+    height=height
+)
+
+st.plotly_chart(fig_backpressure)
+
+st.dataframe(backpressure_by_machine.style.format('{:.4f}'), use_container_width=True)
+
+# Pooled correlation over all active machine-slots
+pooled_timeout_correlation = np.corrcoef(active_loads, timeout_rate_panel[active_panel])[0, 1]
+
+st.markdown(f"""
+##### Throughput versus Time-Out Backpressure Insights
+- **Pooled Correlation of Load with Time-Out Rate:** `{pooled_timeout_correlation:.3f}`
+- **Time-Out Rate at the Lowest Load Decile:** `{load_curve['timeout_rate'].iloc[0]:.2f}%`
+- **Time-Out Rate at the Highest Load Decile:** `{load_curve['timeout_rate'].iloc[-1]:.2f}%`
+- **Machine Most Sensitive to Load (Time-Out Rate):** `{backpressure_by_machine['timeout_rate_correlation'].idxmax()}`
+(correlation `{backpressure_by_machine['timeout_rate_correlation'].max():.3f}`)
+
+A positive correlation and a rising load curve mean that machines fail more often when they are pushed harder, which
+is a sign of backpressure that load balancing or extra capacity at peak times would relieve.
+""")
+
+# Load Rebalancing What-If
+st.write("### Load Rebalancing What-If")
+st.write(" - How evenly would the machines of each cluster be loaded if the same 15-minute arrivals were routed by "
+         "a different policy?")
+
+# Machines share load within a pool of the same cluster and level, so Level 2 workstations only share with each other
+machine_cluster_codes = np.zeros(n_machines_panel, dtype=np.int64)
+machine_cluster_codes[machine_codes] = cluster_codes
+machine_is_level_2 = (np.bincount(machine_codes, weights=level_2_flags, minlength=n_machines_panel) >
+                      np.bincount(machine_codes, minlength=n_machines_panel) / 2)
+pool_codes, pool_labels = pd.factorize(
+    pd.Series(cluster_labels[machine_cluster_codes]) + np.where(machine_is_level_2, ' - Level 2', ' - Level 1'),
+    sort=True)
+n_pools = len(pool_labels)
+pool_membership = np.eye(n_pools)[pool_codes]  # (machine x pool) one-hot matrix
+same_pool_before = (pool_codes[:, None] == pool_codes[None, :]) & np.tri(n_machines_panel, k=-1, dtype=bool).T
+
+# Capacity is each machine's busiest sliding 15-minute window; a machine is open on the days it screened any bag
+machine_capacity = machine_window_peaks.loc[machine_window_peaks['window_minutes'] == 15, 'peak_bags'].to_numpy()
+slot_day_codes = pd.factorize(slot_labels.normalize())[0]
+machine_open_days = bincount_2d(machine_codes, slot_day_codes[slot_codes], n_machines_panel, slot_day_codes.max() + 1)
+open_panel = (machine_open_days[:, slot_day_codes] > 0).T  # (slot x machine)
+
+# Observed arrivals per slot and machine, and the pool's arrivals and open machines broadcast to each machine
+observed_allocation = throughput_panel.T.astype(float)
+pool_arrivals = observed_allocation @ pool_membership
+open_machines = np.maximum(open_panel @ pool_membership, 1)
+
+
+# Function to pour each pool's arrivals into its machines, lowest level first
+def water_fill(levels, amounts, pools, n_groups):
+    """
+    Raises the lowest levels of every pool to a common water level until the pool's amount is used up, for all
+    pools at once. Closed machines carry an infinite level and receive nothing. Returns the amount per machine.
+    """
+    order = np.lexsort((levels, pools))
+    sorted_levels, sorted_pools = levels[order], pools[order]
+    pool_first = np.searchsorted(sorted_pools, np.arange(n_groups))
+    rank = np.arange(len(order)) - pool_first[sorted_pools] + 1
+    cumulative = np.cumsum(np.where(np.isfinite(sorted_levels), sorted_levels, 0))
+    pool_cumulative = cumulative - np.append(0, cumulative)[pool_first][sorted_pools]
+
+    fits = rank * sorted_levels - pool_cumulative <= amounts[sorted_pools] + 1e-9
+    filled = np.bincount(sorted_pools, weights=fits, minlength=n_groups).astype(np.int64)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        water_level = np.where(filled > 0, (amounts + pool_cumulative[np.maximum(pool_first + filled - 1, 0)]) /
+                               filled, -np.inf)
+
+    allocation = np.zeros(len(levels))
+    allocation[order] = np.maximum(water_level[sorted_pools] - sorted_levels, 0)
+    return allocation
+
+
+# Function to round fractional allocations to whole bags without changing any pool's total in a slot
+def whole_bags(allocation, open_slots):
+    """
+    Floors every (slot x machine) allocation and hands each pool's leftover bags to its open machines with the
+    largest fractional parts (largest-remainder rounding), ranking all machines of all slots in one comparison.
+    """
+    floored = np.floor(allocation + 1e-9)
+    fraction = np.where(open_slots, allocation - floored, -1)
+    leftover = np.rint((allocation - floored) @ pool_membership)[:, pool_codes]
+    ahead = (fraction[:, None, :] > fraction[:, :, None]) | (
+        (fraction[:, None, :] == fraction[:, :, None]) & np.tri(n_machines_panel, k=-1, dtype=bool))
+    remainder_rank = (ahead & (pool_codes[None, :] == pool_codes[:, None])).sum(axis=2)
+    return floored + (open_slots & (remainder_rank < leftover))
+
+
+# Function to reroute the observed arrivals by every policy and measure how evenly each pool is loaded
+def load_rebalancing_what_if():
+    """
+    Allocates every slot's pool arrivals round-robin, capacity-weighted and least-loaded, and returns the balance
+    metrics of every pool under these policies and the observed allocation.
+    """
+    # Round-robin: equal shares of open machines, the remainder continuing the rotation from the previous slot
+    open_rank = open_panel.astype(float) @ same_pool_before
+    rotation_start = (np.cumsum(pool_arrivals, axis=0) - pool_arrivals) % open_machines
+    round_robin_allocation = open_panel * (
+        pool_arrivals[:, pool_codes] // open_machines[:, pool_codes] +
+        ((open_rank - rotation_start[:, pool_codes]) % open_machines[:, pool_codes] <
+         pool_arrivals[:, pool_codes] % open_machines[:, pool_codes]))
+
+    # Capacity-weighted: shares proportional to each open machine's capacity
+    open_capacity = open_panel * machine_capacity
+    capacity_weighted_allocation = whole_bags(pool_arrivals[:, pool_codes] * open_capacity / np.maximum(
+        (open_capacity @ pool_membership)[:, pool_codes], 1), open_panel)
+
+    # Least-loaded: each slot's arrivals go to the machines with the smallest backlog left over from earlier slots,
+    # ties going to the machine that has received the fewest bags so far
+    least_loaded_allocation = np.zeros(observed_allocation.shape)
+    machine_backlog = np.zeros(n_machines_panel)
+    machine_received = np.zeros(n_machines_panel)
+    for slot in range(n_slots_panel):
+        machine_load = np.where(open_panel[slot], machine_backlog + machine_received * 1e-6, np.inf)
+        least_loaded_allocation[slot] = whole_bags(water_fill(machine_load, pool_arrivals[slot], pool_codes,
+                                                              n_pools)[None, :], open_panel[slot][None, :])[0]
+        machine_backlog = np.maximum(machine_backlog + least_loaded_allocation[slot] - machine_capacity, 0)
+        machine_received += least_loaded_allocation[slot]
+
+    rebalancing_policies = {
+        'Observed': observed_allocation,
+        'Round-Robin': round_robin_allocation,
+        'Least-Loaded': least_loaded_allocation,
+        'Capacity-Weighted': capacity_weighted_allocation
+    }
+
+    # Balance metrics per pool: machine totals, and per slot across open machines of the pool
+    rebalancing_rows = []
+    busy_slots = pool_arrivals > 0
+    for policy, allocation in rebalancing_policies.items():
+        open_allocation = allocation * open_panel
+        slot_mean = (open_allocation @ pool_membership) / open_machines
+        slot_std = np.sqrt(np.maximum((open_allocation ** 2 @ pool_membership) / open_machines - slot_mean ** 2, 0))
+        rebalanced_totals = allocation.sum(axis=0)
+        for pool_code, pool_label in enumerate(pool_labels):
+            pool_machines = pool_codes == pool_code
+            pool_slots = busy_slots[:, pool_code]
+            rebalancing_rows.append({
+                'Pool': pool_label,
+                'Policy': policy,
+                'CV of Machine Totals': (rebalanced_totals[pool_machines].std() /
+                                         rebalanced_totals[pool_machines].mean()),
+                'Mean Slot CV': (slot_std[pool_slots, pool_code] / slot_mean[pool_slots, pool_code]).mean(),
+                'Mean Slot Max/Mean': (allocation[pool_slots][:, pool_machines].max(axis=1) /
+                                       slot_mean[pool_slots, pool_code]).mean(),
+                'Overloaded Machine-Slots (%)': (allocation[:, pool_machines] >
+                                                 machine_capacity[pool_machines]).mean() * 100
+            })
+    return pd.DataFrame(rebalancing_rows)
+
+
+# Balance metrics of every policy and pool, computed once per process and scan source
+load_rebalancing = shared_data_product('load_rebalancing', scan_source_key, load_rebalancing_what_if)
+
+# Compare the per-slot balance of every policy within each pool
+fig_rebalancing = px.bar(
+    load_rebalancing,
+    x='Pool',
+    y='Mean Slot CV',
+    color='Policy',
+    barmode='group',
+    title='Mean 15-Minute Coefficient of Variation Across Machines by Routing Policy',
+    labels={'Mean Slot CV': 'Mean Coefficient of Variation'}
+)
+
+fig_rebalancing.update_layout(
+    xaxis=dict(
+        tickangle=0,
+        tickfont=dict(size=xtick_size),
+        title=dict(text='Pool', font=dict(size=xlabel_size))
+    ),
+    yaxis=dict(
+        tickfont=dict(size=ytick_size),
+        title=dict(text='Mean Coefficient of Variation', font=dict(size=ylabel_size))
+    ),
+    width=width,
+    height=height
+)
+
+st.plotly_chart(fig_rebalancing)
+
+st.dataframe(load_rebalancing.style.format(precision=3), use_container_width=True)
+
+best_policy_by_pool = load_rebalancing[load_rebalancing['Policy'] != 'Observed'].loc[
+    lambda frame: frame.groupby('Pool')['Mean Slot CV'].idxmin()].set_index('Pool')['Policy']
+st.markdown(f"""
+##### Load Rebalancing Insights
+- **Most Balanced Policy per Pool:** {', '.join(f'`{pool}`: `{policy}`' for pool, policy in best_policy_by_pool.items())}
+- **Observed Mean Slot CV (All Pools):**
+`{load_rebalancing.loc[load_rebalancing['Policy'] == 'Observed', 'Mean Slot CV'].mean():.3f}`
+
+Each policy redistributes exactly the observed arrivals of a pool among the machines open that day. Round-robin
+evens out bag counts, capacity-weighted matches each machine's demonstrated peak, and least-loaded steers bags away
+from machines still working through a backlog.
+""")
+
+# Rolling Fairness Across Machines
+st.write("### Rolling Fairness Across Machines")
+st.write(" - When, within each cluster, is the workload spread unevenly across machines?")
+
+# Bucket length of each resolution in seconds and the rolling window length in buckets; buckets are dense in time,
+# so a window covers that much real time even across hours or days without scans
+fairness_resolutions = {
+    'Hourly': (60 * 60, 3, 'Hour'),
+    'Daily': (seconds_per_day, 3, 'Day')
+}
+slot_label_seconds = slot_labels.asi8 // 10 ** 9
+fairness_pools = np.flatnonzero(np.bincount(pool_codes, minlength=n_pools) > 1)  # Pools with machines to compare
+
+
+# Function to compute fairness metrics across the open machines of every pool for every window at once
+def fairness_metrics(window_loads, window_open):
+    """
+    Takes (window x machine) loads and open flags and returns (window x pool) CV, Gini coefficient, Jain's
+    fairness index and max/mean ratio over each pool's open machines. Sums come from products with the pool
+    membership matrix and the Gini mean absolute difference from one pairwise comparison of all machines.
+    """
+    loads = window_loads * window_open
+    n_open = window_open @ pool_membership
+    sums = loads @ pool_membership
+    square_sums = (loads ** 2) @ pool_membership
+    in_pool = window_open[:, :, None] & (pool_membership[None, :, :] > 0)  # window x machine x pool
+
+    same_pool_open = (window_open[:, :, None] & window_open[:, None, :] &
+                      (pool_codes[:, None] == pool_codes[None, :])[None, :, :])
+    absolute_differences = (np.abs(loads[:, :, None] - loads[:, None, :]) * same_pool_open).sum(axis=2)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = sums / n_open
+        return {
+            'CV': np.sqrt(np.maximum(square_sums / n_open - mean ** 2, 0)) / mean,
+            'Gini': (absolute_differences @ pool_membership) / (2 * n_open ** 2 * mean),
+            "Jain's Index": sums ** 2 / (n_open * square_sums),
+            'Max/Mean': np.where(in_pool, loads[:, :, None], -np.inf).max(axis=1) / mean
+        }
+
+
+fairness_by_resolution = {}
+for resolution, (bucket_seconds, window, _) in fairness_resolutions.items():
+    slot_buckets, bucket_origin = midnight_buckets(slot_label_seconds, bucket_seconds)
+    n_buckets = slot_buckets.max() + 1
+    bucket_labels = pd.to_datetime(bucket_origin + np.arange(n_buckets) * bucket_seconds, unit='s')
+    bucket_loads = bincount_2d(slot_buckets[slot_codes], machine_codes, n_buckets, n_machines_panel)
+    bucket_open = bincount_2d(np.repeat(slot_buckets, n_machines_panel),
+                              np.tile(np.arange(n_machines_panel), len(slot_buckets)),
+                              n_buckets, n_machines_panel, weights=open_panel.ravel()) > 0
+
+    # Rolling window sums of the loads and any-open flags from cumulative sums over the buckets
+    cumulative_loads = np.cumsum(np.pad(bucket_loads, ((1, 0), (0, 0))), axis=0)
+    cumulative_open = np.cumsum(np.pad(bucket_open.astype(int), ((1, 0), (0, 0))), axis=0)
+    window_loads = cumulative_loads[window:] - cumulative_loads[:-window]
+    window_open = (cumulative_open[window:] - cumulative_open[:-window]) > 0
+
+    metrics = fairness_metrics(window_loads, window_open)
+    fairness_by_resolution[resolution] = pd.concat([
+        pd.DataFrame({'window_end': bucket_labels[window - 1:], 'pool': pool_labels[pool_code],
+                      **{metric: values[:, pool_code] for metric, values in metrics.items()}})
+        for pool_code in fairness_pools
+    ], ignore_index=True)
+
+# One tab per resolution with every fairness metric over time for each pool
+for fairness_tab, resolution in zip(st.tabs(list(fairness_by_resolution)), fairness_by_resolution):
+    with fairness_tab:
+        fairness_long = fairness_by_resolution[resolution].melt(id_vars=['window_end', 'pool'], var_name='metric')
+        fig_fairness = px.line(
+            fairness_long,
+            x='window_end',
+            y='value',
+            color='pool',
+            facet_row='metric',
+            title=f'{resolution} Rolling Fairness Across Machines ({fairness_resolutions[resolution][1]}-'
+                  f'{fairness_resolutions[resolution][2]} Window)',
+            labels={'window_end': 'Window End', 'value': 'Value', 'pool': 'Pool'}
+        )
+        fig_fairness.update_yaxes(matches=None)
+        fig_fairness.update_layout(width=width, height=height * 1.5)
+        st.plotly_chart(fig_fairness)
+
+hourly_fairness = fairness_by_resolution['Hourly']
+least_fair_windows = hourly_fairness.loc[hourly_fairness.groupby('pool')['Gini'].idxmax()]
+
+st.write("#### Least Balanced Hourly Windows per Pool")
+st.dataframe(least_fair_windows.style.format(precision=3), use_container_width=True)
+
+st.markdown(f"""
+##### Rolling Fairness Insights
+- **Mean Hourly Gini Coefficient:** `{hourly_fairness['Gini'].mean():.3f}` (0 means perfectly even)
+- **Mean Hourly Jain's Index:** `{hourly_fairness["Jain's Index"].mean():.3f}` (1 means perfectly even)
+- **Least Balanced Hourly Window:** `{least_fair_windows.loc[least_fair_windows['Gini'].idxmax(), 'pool']}` ending
+`{least_fair_windows.loc[least_fair_windows['Gini'].idxmax(), 'window_end']}`
+
+Unlike the single CV and MAD for the whole month above, these metrics show the hours and days in which the machines of
+a cluster drift apart, which is where routing or staffing changes pay off.
+""")
+
 st.markdown(f"""## Chapter - 5""")
 
 st.markdown(f"""### Screening Escalations and Level 2 Analysis""")
@@ -1631,7 +3249,7 @@ st.write(" - Are there trends in Level 2 escalations across time?")
 st.write(" - Are there machines when Level 2 escalations are disproportionately higher?")
 
 # Data Manipulation for Scan Machine Level Distribution Section
-level_counts = data['scan_machine_level'].value_counts()
+level_counts = numpy_backed(data['scan_machine_level'].value_counts())
 
 # Metrics for display
 level_2_count = level_counts.get('Level 2', 0)
@@ -1651,17 +3269,17 @@ level_1_count = level_counts.get('Level 1', 0)  # Get count for Level 1
 level_labels = level_counts.index.tolist()
 
 # Filter data for Level 2 screening
-level_2_data = data[data['scan_machine_level'] == 'Level 2']
+level_2_data = shared_data_product('level_2_data', scan_source_key, lambda: data[is_level_2_scan])
 
 # Group Level 2 escalations by day
-level_2_by_day = level_2_data.groupby(level_2_data['bag_scan_timestamp'].dt.date).size()
+level_2_by_day = chapter_aggregate('level_2_by_day')
 
 # Group data by machine and cluster for Level 2 escalations
-level_2_by_machine = level_2_data.groupby('scan_machine_id').size()
-level_2_by_cluster = level_2_data.groupby('scan_machine_cluster').size()
+level_2_by_machine = chapter_aggregate('level_2_by_machine')
+level_2_by_cluster = chapter_aggregate('level_2_by_cluster')
 
 # Calculate proportion of Level 2 escalations per machine relative to total processed by each machine
-machine_totals = data['scan_machine_id'].value_counts()
+machine_totals = numpy_backed(data['scan_machine_id'].value_counts())
 level_2_proportions = round((level_2_by_machine / machine_totals), 2).sort_values(ascending=False)
 
 # Bar chart of bags at each screening level
@@ -1806,10 +3424,12 @@ median_level_2 = level_2_by_day.median()
 std_level_2 = level_2_by_day.std()
 variance_level_2 = level_2_by_day.var()
 
-# Moving Averages
-window_size = 7  # Window size for moving average (7 days for SMA)
-sma_level_2 = level_2_by_day.rolling(window=window_size).mean()  # Simple Moving Average
-ema_level_2 = level_2_by_day.ewm(span=window_size, adjust=False).mean()  # Exponential Moving Average
+# Moving Averages from the daily rolling statistics (7-day window), aligned to the days with Level 2 escalations
+window_size = rolling_resolutions['Daily'][1]
+level_2_daily_stats = rolling_stats['Daily', 'Level 2 Escalations']
+level_2_days = pd.to_datetime(level_2_by_day.index)
+sma_level_2 = level_2_daily_stats['sma']['All Machines'].reindex(level_2_days)  # Simple Moving Average
+ema_level_2 = level_2_daily_stats['ema']['All Machines'].reindex(level_2_days)  # Exponential Moving Average
 
 # Add moving averages to plot
 fig_level2_days = px.line(
@@ -1841,6 +3461,147 @@ st.plotly_chart(fig_level2_days)
 # Change Detection: Calculate daily differences
 level_2_changes = level_2_by_day.diff().fillna(0)  # Difference from previous day
 
+# Change-Point Detection by Machine
+st.write("### Change-Point Detection by Machine")
+st.write(" - When did a machine's throughput, time-out rate or Level 2 rate shift to a new level?")
+
+# Season length (in buckets) removed before detection and the shortest segment the segmentation may return
+change_point_resolutions = {'Daily': (1, 3), 'Hourly': (24, 6)}
+cusum_allowance = 0.5  # Slack k, in standard deviations of the self-starting scores
+cusum_false_alarm_probability = 0.05  # Chance of a CUSUM alarm anywhere in a series without a change
+
+
+# Function to segment every row of a standardized panel into constant-mean pieces with a penalty per change
+def penalized_segmentation(z_panel, min_segment, penalty=None):
+    """
+    Optimal partitioning with a Gaussian mean-change cost and a BIC penalty (2 log n) per change point. The
+    segment costs come from cumulative sums and every row is minimized together for each segment end, so
+    the work is O(n^2) per row but a single array operation per period. Returns the sorted change points
+    (start index of each new segment) for every row.
+    """
+    n_series, n_periods = z_panel.shape
+    penalty = 2 * np.log(n_periods) if penalty is None else penalty
+    cumulative = np.cumsum(np.pad(z_panel, ((0, 0), (1, 0))), axis=1)
+    cumulative_squares = np.cumsum(np.pad(z_panel ** 2, ((0, 0), (1, 0))), axis=1)
+
+    best_cost = np.full((n_series, n_periods + 1), np.inf)
+    best_cost[:, 0] = -penalty
+    last_change = np.zeros((n_series, n_periods + 1), dtype=int)
+
+    for end in range(min_segment, n_periods + 1):
+        candidates = np.arange(end - min_segment + 1)
+        segment_sums = cumulative[:, end:end + 1] - cumulative[:, candidates]
+        segment_costs = (cumulative_squares[:, end:end + 1] - cumulative_squares[:, candidates]
+                         - segment_sums ** 2 / (end - candidates))
+        total_costs = best_cost[:, candidates] + segment_costs + penalty
+        best_candidate = np.argmin(total_costs, axis=1)
+        best_cost[:, end] = total_costs[np.arange(n_series), best_candidate]
+        last_change[:, end] = candidates[best_candidate]
+
+    # Walk the stored segment starts back from the last period of every row
+    change_points = []
+    for row in range(n_series):
+        row_points, end = [], n_periods
+        while end > 0:
+            end = last_change[row, end]
+            if end > 0:
+                row_points.append(end)
+        change_points.append(row_points[::-1])
+
+    return change_points
+
+
+# Function to detect change points in every machine's daily and hourly throughput, time-out rate and Level 2 rate
+def detect_change_points(stats_by_resolution, resolutions):
+    """
+    Builds the throughput, time-out rate and Level 2 rate panels from the rolling statistics engine's bucket
+    counts and runs CUSUM and the penalized segmentation on all machines of a panel in one batch. CUSUM starts
+    monitoring after the first rolling window of each resolution. Returns one row per detected change with the
+    mean level before and after it.
+    """
+    change_rows = []
+
+    for resolution, (season_length, min_segment) in resolutions.items():
+        throughput = stats_by_resolution[resolution, 'Throughput']['value']
+        active_throughput = throughput.where(throughput > 0)
+        metric_frames = {
+            'Throughput': throughput,
+            'Time-Out Rate': stats_by_resolution[resolution, 'Time-Outs']['value'] / active_throughput,
+            'Level 2 Rate': stats_by_resolution[resolution, 'Level 2 Escalations']['value'] / active_throughput
+        }
+
+        for metric, frame in metric_frames.items():
+            panel = frame.to_numpy().T
+            z_panel = standardize_panel(panel, season_length, rolling_resolutions[resolution][1])
+            alarm, start, direction = batched_cusum(z_panel, rolling_resolutions[resolution][1], cusum_allowance,
+                                                    cusum_false_alarm_probability)
+            segments = penalized_segmentation(np.nan_to_num(z_panel), min_segment)
+
+            for row, series_label in enumerate(frame.columns):
+                if alarm[row] >= 0:
+                    change_rows.append({
+                        'resolution': resolution, 'metric': metric, 'series': series_label, 'method': 'CUSUM',
+                        'change_start': frame.index[start[row]], 'alarm': frame.index[alarm[row]],
+                        'direction': 'Increase' if direction[row] > 0 else 'Decrease',
+                        'mean_before': np.nanmean(panel[row, :start[row]]),
+                        'mean_after': np.nanmean(panel[row, start[row]:alarm[row] + 1])
+                    })
+                bounds = [0, *segments[row], panel.shape[1]]
+                for before_start, change, after_end in zip(bounds[:-2], bounds[1:-1], bounds[2:]):
+                    mean_before = np.nanmean(panel[row, before_start:change])
+                    mean_after = np.nanmean(panel[row, change:after_end])
+                    change_rows.append({
+                        'resolution': resolution, 'metric': metric, 'series': series_label,
+                        'method': 'Segmentation', 'change_start': frame.index[change], 'alarm': pd.NaT,
+                        'direction': 'Increase' if mean_after > mean_before else 'Decrease',
+                        'mean_before': mean_before, 'mean_after': mean_after
+                    })
+
+    return pd.DataFrame(change_rows, columns=['resolution', 'metric', 'series', 'method', 'change_start', 'alarm',
+                                              'direction', 'mean_before', 'mean_after'])
+
+
+# Change points of every machine and metric, computed once per process and scan source
+change_points = shared_data_product('change_points', scan_source_key,
+                                    lambda: detect_change_points(rolling_stats, change_point_resolutions))
+change_point_counts = change_points.groupby(['resolution', 'method', 'metric', 'series']).size().reset_index(
+    name='change_points')
+
+# Number of change points per machine, metric and method at each resolution
+fig_change_points = px.bar(
+    change_point_counts,
+    x='series',
+    y='change_points',
+    color='metric',
+    barmode='group',
+    facet_row='resolution',
+    facet_col='method',
+    title='Detected Change Points per Machine',
+    labels={'series': 'Machine ID', 'change_points': 'Change Points', 'metric': 'Metric'}
+)
+
+fig_change_points.update_layout(width=width, height=height * 1.5)
+
+st.plotly_chart(fig_change_points)
+
+st.write("#### Most Recent Change Points")
+st.dataframe(
+    change_points.sort_values(by='change_start', ascending=False).head(15).style.format(
+        {'mean_before': '{:.4f}', 'mean_after': '{:.4f}'}),
+    use_container_width=True
+)
+
+st.markdown(f"""
+##### Change-Point Detection Insights
+- **CUSUM Alarms:** `{(change_points['method'] == 'CUSUM').sum():,}` series drifted from their earlier mean by more
+than `{cusum_allowance}` standard deviations for long enough to cross a decision interval sized so that a series
+without a change raises a false alarm with `{cusum_false_alarm_probability:.0%}` probability.
+- **Segmentation Change Points:** `{(change_points['method'] == 'Segmentation').sum():,}` level shifts across all
+machines, metrics and resolutions.
+- Hourly series are compared after removing each machine's hour-of-day profile, so the daily rush itself is not
+reported as a change.
+""")
+
 # Display the statistical metrics
 st.markdown(f"""
 ##### Statistical Insights for Level 2 Escalations
@@ -1905,25 +3666,11 @@ st.plotly_chart(fig_level2_clusters)
 # Level 2 Escalations by Machine ID
 st.write("#### Level 2 Escalations by Machine ID")
 
-# Statistical Calculations for Each Machine
-machine_means = level_2_by_machine
-machine_stds = machine_means.std()  # Standard deviation of Level 2 counts
-
-# Statistical Calculations
-machine_mean = machine_means.mean()  # Overall mean
-machine_std = machine_means.std()  # Overall standard deviation
-confidence_level = 0.95
-
-# Number of machines
-n_machines = len(machine_means)
-
-# Calculate overall confidence intervals
-stderr = machine_std / np.sqrt(n_machines)  # Standard error
-ci_range = stats.t.ppf((1 + confidence_level) / 2, n_machines - 1) * stderr  # CI range for t-distribution
-
-# Compute scalar CI bounds
-ci_lower = machine_mean - ci_range
-ci_upper = machine_mean + ci_range
+# Statistical Calculations: overall mean and confidence interval of the Level 2 counts per machine
+level_2_by_machine_ci = grouped_mean_confidence_interval(level_2_by_machine.values, confidence_level=confidence_level)
+machine_mean = level_2_by_machine_ci.loc[0, 'mean']  # Overall mean
+ci_lower = level_2_by_machine_ci.loc[0, 'ci_lower']
+ci_upper = level_2_by_machine_ci.loc[0, 'ci_upper']
 
 # Visualization: Level 2 escalations by machine
 fig_level2_machines = px.bar(
@@ -1980,18 +3727,15 @@ st.plotly_chart(fig_level2_machines)
 # Display machines with the highest Level 2 proportions
 st.write("#### Machines with Level 2 Escalation Proportions")
 
-# Statistical Calculations
-level_2_mean = level_2_proportions.mean()
-level_2_std = level_2_proportions.std()
-level_2_variance = level_2_proportions.var()
-confidence_level = 0.95
-
-# Calculate the confidence interval for Level 2 proportions
-n = len(level_2_proportions)  # Number of machines
-stderr = level_2_std / np.sqrt(n)  # Standard error
-ci_range = stats.t.ppf((1 + confidence_level) / 2, n - 1) * stderr
-ci_lower = level_2_mean - ci_range
-ci_upper = level_2_mean + ci_range
+# Statistical Calculations and the confidence interval for Level 2 proportions
+level_2_proportions_ci = grouped_mean_confidence_interval(level_2_proportions.dropna().values,
+                                                          confidence_level=confidence_level)
+level_2_mean = level_2_proportions_ci.loc[0, 'mean']
+level_2_std = level_2_proportions_ci.loc[0, 'std']
+level_2_variance = level_2_std ** 2
+ci_range = level_2_proportions_ci.loc[0, 'margin_of_error']
+ci_lower = level_2_proportions_ci.loc[0, 'ci_lower']
+ci_upper = level_2_proportions_ci.loc[0, 'ci_upper']
 
 # Plot a horizontal bar chart for Level 2 proportions
 fig_level2_high_machines_styled = px.bar(
@@ -2045,6 +3789,111 @@ fig_level2_high_machines_styled.update_traces(
 # Display chart
 st.plotly_chart(fig_level2_high_machines_styled)
 
+# Level 2 proportion of every machine with its 95% Wilson interval from one vectorized call
+level_2_wilson = proportion_confidence_interval(
+    level_2_by_machine.reindex(machine_totals.index, fill_value=0).values,
+    machine_totals.values,
+    confidence_level=confidence_level
+).set_index(machine_totals.index).sort_values(by='proportion', ascending=False)
+
+# Machines whose whole interval lies above the overall Level 2 proportion
+level_2_significantly_high = level_2_wilson[level_2_wilson['ci_lower'] > level_2_proportion]
+
+fig_level2_wilson = px.bar(
+    level_2_wilson,
+    x=level_2_wilson.index,
+    y='proportion',
+    error_y=level_2_wilson['ci_upper'] - level_2_wilson['proportion'],
+    error_y_minus=level_2_wilson['proportion'] - level_2_wilson['ci_lower'],
+    title="Level 2 Escalation Proportion per Machine with 95% Wilson Intervals",
+    labels={'x': 'Machine ID', 'proportion': 'Level 2 Proportion'}
+)
+
+fig_level2_wilson.add_hline(y=level_2_proportion, line_dash="dash", line_color="green",
+                            annotation_text="Overall Level 2 Proportion")
+
+fig_level2_wilson.update_layout(
+    xaxis=dict(
+        tickangle=0,
+        tickfont=dict(size=xtick_size),
+        title=dict(text='Machine ID', font=dict(size=xlabel_size))
+    ),
+    yaxis=dict(
+        tickfont=dict(size=ytick_size),
+        title=dict(text='Level 2 Proportion', font=dict(size=ylabel_size))
+    ),
+    width=width,
+    height=height
+)
+
+st.plotly_chart(fig_level2_wilson)
+
+st.markdown(f"""
+Machines whose whole 95% Wilson interval lies above the overall Level 2 proportion of `{level_2_proportion:.2%}`:
+`{', '.join(map(str, level_2_significantly_high.index)) or 'None'}`
+""")
+
+# Bootstrap Confidence Intervals for Machine Rates
+st.write("#### Bootstrap Confidence Intervals for Machine Rates")
+
+# Number of bootstrap replicates, random seed and worker processes (1 keeps everything in this process)
+bootstrap_replicates = 2000
+bootstrap_seed = 42
+bootstrap_workers = 1
+
+# Bootstrap the Level 2 and time-out rates of all machines
+bags_by_machine_code = np.bincount(machine_codes, minlength=len(machine_labels))
+bootstrap_rates = {}
+for rate_label, rate_flags in [('Level 2 Rate', level_2_flags), ('Time-Out Rate', timeout_flags)]:
+    rate_successes = np.bincount(machine_codes, weights=rate_flags, minlength=len(machine_labels))
+    rate_intervals = bootstrap_rate_intervals(rate_successes, bags_by_machine_code, bootstrap_replicates,
+                                              confidence_level=confidence_level, seed=bootstrap_seed,
+                                              workers=bootstrap_workers)
+    rate_intervals.index = machine_labels
+
+    # A machine is anomalous when its whole interval lies away from the rate of all machines combined
+    pooled_rate = rate_successes.sum() / bags_by_machine_code.sum()
+    rate_intervals['anomalous'] = (rate_intervals['ci_lower'] > pooled_rate) | (rate_intervals['ci_upper'] < pooled_rate)
+    bootstrap_rates[rate_label] = rate_intervals
+
+    fig_bootstrap = px.scatter(
+        rate_intervals,
+        x=rate_intervals.index,
+        y='rate',
+        color='anomalous',
+        error_y=rate_intervals['ci_upper'] - rate_intervals['rate'],
+        error_y_minus=rate_intervals['rate'] - rate_intervals['ci_lower'],
+        title=f'{rate_label} per Machine with {bootstrap_replicates:,}-Replicate Bootstrap Intervals',
+        labels={'x': 'Machine ID', 'rate': rate_label, 'anomalous': 'Anomalous'},
+        color_discrete_map={True: 'red', False: 'steelblue'}
+    )
+
+    fig_bootstrap.add_hline(y=pooled_rate, line_dash="dash", line_color="green",
+                            annotation_text=f"{rate_label} (All Machines)")
+
+    fig_bootstrap.update_layout(
+        xaxis=dict(
+            tickangle=0,
+            tickfont=dict(size=xtick_size),
+            title=dict(text='Machine ID', font=dict(size=xlabel_size))
+        ),
+        yaxis=dict(
+            tickfont=dict(size=ytick_size),
+            title=dict(text=rate_label, font=dict(size=ylabel_size))
+        ),
+        width=width,
+        height=height
+    )
+
+    st.plotly_chart(fig_bootstrap)
+
+st.markdown(f"""
+Machines flagged as anomalous have a bootstrap interval that excludes the rate of all machines combined, so their
+difference is unlikely to be noise:
+- **Level 2 Rate:** `{', '.join(map(str, bootstrap_rates['Level 2 Rate'].query('anomalous').index)) or 'None'}`
+- **Time-Out Rate:** `{', '.join(map(str, bootstrap_rates['Time-Out Rate'].query('anomalous').index)) or 'None'}`
+""")
+
 # Get the machine ID with the highest level 2 escalation
 top_level_2_scan_machine = level_2_proportions.idxmax()
 
@@ -2093,10 +3942,10 @@ st.write("Let's conduct a more detailed analysis of Multiple Screenings cases by
          " each machine, each cluster, and breaking them down by day and hour.")
 
 # Data Manipulation for Multiple Screenings Section
-multiple_screenings = data.groupby('bag_licence_plate').size()
+multiple_screenings = chapter_aggregate('scans_per_bag')
 recirculated_bags = multiple_screenings[multiple_screenings > 1]
-cleared_then_reexamined = data[data['bag_licence_plate'].isin(recirculated_bags.index) &
-                               (data['scan_machine_result'] == 'Cleared')]
+cleared_then_reexamined = shared_data_product('cleared_then_reexamined', scan_source_key, lambda: data[
+    data['bag_licence_plate'].isin(recirculated_bags.index).to_numpy(dtype=bool) & is_cleared_scan])
 
 # Visualization: Distribution of Screening Counts per Bag
 st.write("#### Distribution of Screening Counts per Bag")
@@ -2191,8 +4040,8 @@ st.plotly_chart(fig_top_10)
 
 
 # Identify Bags Re-Screened After Clearance
-cleared_bags = data[data['scan_machine_result'] == 'Cleared']
-recirculated_bags = data.groupby('bag_licence_plate').size()
+cleared_bags = shared_data_product('cleared_bags', scan_source_key, lambda: data[is_cleared_scan])
+recirculated_bags = chapter_aggregate('scans_per_bag')
 recirculated_after_clearance = cleared_bags[cleared_bags['bag_licence_plate'].isin(
     recirculated_bags[recirculated_bags > 1].index
 )]
@@ -2206,15 +4055,14 @@ percent_recirculated = (num_recirculated / total_cleared_bags) * 100
 recirculation_frequency = recirculated_bags.value_counts().sort_index()
 
 # Investigate reasons for recirculation among recirculated bags
-recirculated_data = data[data['bag_licence_plate'].isin(
-    recirculated_bags[recirculated_bags > 1].index
-)]
+recirculated_data = shared_data_product('recirculated_data', scan_source_key, lambda: data[
+    data['bag_licence_plate'].isin(recirculated_bags[recirculated_bags > 1].index)])
 
-recirculated_reasons = recirculated_data['scan_machine_result_reason'].value_counts()
+recirculated_reasons = numpy_backed(recirculated_data['scan_machine_result_reason'].value_counts())
 
 # Check machine and cluster involvement
-machine_recirc = recirculated_data['scan_machine_id'].value_counts()
-cluster_recirc = recirculated_data['scan_machine_cluster'].value_counts()
+machine_recirc = numpy_backed(recirculated_data['scan_machine_id'].value_counts())
+cluster_recirc = numpy_backed(recirculated_data['scan_machine_cluster'].value_counts())
 
 # Bags Re-Screened After Clearance
 fig_recirculation = px.bar(
@@ -2289,7 +4137,7 @@ recirculation_cluster_contribution = recirculated_data.groupby('scan_machine_clu
 recirculation_time_trends = recirculated_data.groupby(recirculated_data['bag_scan_timestamp'].dt.hour).size()
 
 # Analyze relationship between screening levels and recirculation
-screening_level_recirculation = recirculated_data['scan_machine_level'].value_counts()
+screening_level_recirculation = numpy_backed(recirculated_data['scan_machine_level'].value_counts())
 
 # Machine Contribution to Recirculation
 fig_machine_contribution = px.bar(
@@ -2519,16 +4367,326 @@ With these actions, Terminal 3 can significantly enhance screening efficiency, r
 ensure a smoother passenger experience. 
 """)
 
+# Re-Scan Delay After Clearance
+st.write("### Re-Scan Delay After Clearance")
+st.write(" - How long after a 'Cleared' result does a bag come back, and on which machine?")
+
+# Scans sorted by bag and time so consecutive rows follow each bag's journey, sorted once per process and scan source
+plate_sorted = shared_data_product('plate_sorted', scan_source_key, lambda: data.sort_values(
+    by=['bag_licence_plate', 'bag_scan_timestamp'], kind='mergesort'))
+
+
+# Function to pair every cleared scan with the next scan of the same bag
+def cleared_rescan_delays():
+    """
+    Returns one row per cleared scan that was followed by another scan of the same bag (the next row of the
+    bag-sorted scans), with both machines, the hour of clearance, the new result and the delay in minutes.
+    """
+    plate_values = plate_sorted['bag_licence_plate'].to_numpy()
+    plate_timestamps = plate_sorted['bag_scan_timestamp'].to_numpy()
+    plate_machines = plate_sorted['scan_machine_id'].to_numpy()
+    plate_results = plate_sorted['scan_machine_result'].to_numpy()
+    next_is_same_bag = np.append(plate_values[1:] == plate_values[:-1], False)
+    rescan_index = np.flatnonzero((plate_results == 'Cleared') & next_is_same_bag)
+    return pd.DataFrame({
+        'bag_licence_plate': plate_values[rescan_index],
+        'cleared_machine_id': plate_machines[rescan_index],
+        'cleared_hour': plate_sorted['hour'].to_numpy()[rescan_index],
+        'rescan_machine_id': plate_machines[rescan_index + 1],
+        'rescan_result': plate_results[rescan_index + 1],
+        'rescan_delay_minutes': (plate_timestamps[rescan_index + 1] - plate_timestamps[rescan_index])
+                                / np.timedelta64(1, 'm')
+    })
+
+
+# Cleared scans and their re-scans, computed once per process and scan source
+cleared_rescans = shared_data_product('cleared_rescans', scan_source_key, cleared_rescan_delays)
+
+# Distributions of the re-scan delay per machine and per hour of clearance
+rescan_delay_by_machine = cleared_rescans.groupby('cleared_machine_id')['rescan_delay_minutes'].agg(
+    ['count', 'median', 'mean'])
+rescan_delay_by_hour = cleared_rescans.groupby('cleared_hour')['rescan_delay_minutes'].agg(['count', 'median'])
+
+# Recirculation loops: where cleared bags come back to and with which new result
+rescan_loops = (cleared_rescans
+                .groupby(['cleared_machine_id', 'rescan_machine_id', 'rescan_result'])['rescan_delay_minutes']
+                .agg(['count', 'median'])
+                .sort_values(by='count', ascending=False)
+                .reset_index())
+rescan_loops.columns = ['Cleared At', 'Re-Scanned At', 'New Result', 'Re-Scans', 'Median Delay (minutes)']
+
+# Box plot of the re-scan delay per clearing machine
+fig_rescan_delay = px.box(
+    cleared_rescans,
+    x='cleared_machine_id',
+    y='rescan_delay_minutes',
+    title='Re-Scan Delay After Clearance by Machine',
+    labels={'cleared_machine_id': 'Machine ID (Cleared At)', 'rescan_delay_minutes': 'Re-Scan Delay (minutes)'},
+    color='cleared_machine_id'
+)
+
+fig_rescan_delay.update_layout(
+    showlegend=False,
+    xaxis=dict(
+        tickangle=0,
+        tickfont=dict(size=xtick_size),
+        title=dict(text='Machine ID (Cleared At)', font=dict(size=xlabel_size))
+    ),
+    yaxis=dict(
+        tickfont=dict(size=ytick_size),
+        title=dict(text='Re-Scan Delay (minutes)', font=dict(size=ylabel_size))
+    ),
+    width=width,
+    height=height
+)
+
+st.plotly_chart(fig_rescan_delay)
+
+# Median re-scan delay by hour of clearance
+fig_rescan_hour = px.bar(
+    rescan_delay_by_hour,
+    x=rescan_delay_by_hour.index,
+    y='median',
+    title='Median Re-Scan Delay by Hour of Clearance',
+    labels={'x': 'Hour', 'median': 'Median Re-Scan Delay (minutes)'},
+    color='count',
+    color_continuous_scale='Reds'
+)
+
+fig_rescan_hour.update_traces(text=rescan_delay_by_hour['median'].round(1), textposition='outside')
+
+fig_rescan_hour.update_layout(
+    xaxis=dict(
+        tickmode='linear',
+        tickangle=0,
+        tickfont=dict(size=xtick_size),
+        title=dict(text='Hour', font=dict(size=xlabel_size))
+    ),
+    yaxis=dict(
+        tickfont=dict(size=ytick_size),
+        title=dict(text='Median Re-Scan Delay (minutes)', font=dict(size=ylabel_size))
+    ),
+    coloraxis_colorbar=dict(title="Re-Scans"),
+    width=width,
+    height=height
+)
+
+st.plotly_chart(fig_rescan_hour)
+
+st.write("#### Most Frequent Recirculation Loops After Clearance")
+st.dataframe(rescan_loops.head(10).style.format({'Median Delay (minutes)': '{:.2f}'}), use_container_width=True)
+
+st.markdown(f"""
+##### Re-Scan Delay After Clearance Insights
+- **Cleared Scans Followed by Another Scan:** `{len(cleared_rescans):,}`
+- **Median Re-Scan Delay:** `{cleared_rescans['rescan_delay_minutes'].median():.2f}` minutes
+- **Machine with the Most Re-Scans After Clearance:** `{rescan_delay_by_machine['count'].idxmax()}`
+(`{rescan_delay_by_machine['count'].max():,}` re-scans)
+- **Hour with the Most Re-Scans After Clearance:** `{rescan_delay_by_hour['count'].idxmax()}:00`
+
+Short delays point to bags looping straight back into the screening system, consuming scanner capacity that could be
+used for new bags. The loop table above shows which machine pairs are responsible for most of these returns.
+""")
+
+# Markov Chain of Screening States
+st.write("### Markov Chain of Screening States")
+st.write(" - From a bag's first scan, how many scans does it need and how likely is it to reach Level 2?")
+
+
+# Function to accumulate grouped transition counts into one sparse matrix
+def grouped_transition_counts(group_codes, from_states, to_states, n_groups, n_from, n_to):
+    """
+    Sums one count per transition into a sparse (group * from-state x to-state) matrix, where duplicate entries
+    are added on conversion, and returns it as a dense (group x from-state x to-state) array.
+    """
+    counts = coo_matrix((np.ones(len(from_states)), (group_codes * n_from + from_states, to_states)),
+                        shape=(n_groups * n_from, n_to))
+    return counts.toarray().reshape(n_groups, n_from, n_to)
+
+
+# Function to solve the linear system of every group in one batch
+def solve_groups(matrices, right_hand_sides):
+    """
+    Solves matrices[g] @ x = right_hand_sides[g] for every group g at once. A group whose matrix is singular (a
+    closed loop of states the bags never leave) has no solution and gets NaN instead of failing the whole batch.
+    """
+    solutions = np.full(np.broadcast_shapes(right_hand_sides.shape, matrices.shape[:1] + right_hand_sides.shape[1:]),
+                        np.nan)
+    if matrices.shape[-1] == 0:
+        return solutions
+    with np.errstate(invalid='ignore', divide='ignore', over='ignore'):
+        is_solvable = np.linalg.cond(matrices) < 1 / np.finfo(float).eps
+    solutions[is_solvable] = np.linalg.solve(matrices[is_solvable],
+                                             np.broadcast_to(right_hand_sides, solutions.shape)[is_solvable])
+    return solutions
+
+
+# Function to fit the Markov chain of screening states for every group of transitions
+def markov_chain_of_screening_states():
+    """
+    Builds the transition and initial-state counts of all scans, every cluster and every hour of day in one sparse
+    accumulation and solves the absorbing chain of every group in one batch. Returns the state labels, the
+    transition probabilities, the summary per group, the Level 2 absorption probabilities and the predicted and
+    observed Level 2 workload by hour.
+    """
+    # Bag-sorted plates, hours and whether the next row continues the same bag
+    plate_values = plate_sorted['bag_licence_plate'].to_numpy()
+    plate_hours = plate_sorted['hour'].to_numpy()
+    next_is_same_bag = np.append(plate_values[1:] == plate_values[:-1], False)
+
+    # A bag's state is the level and result of its current scan, with a missing level or result kept as 'Unknown'
+    # so every scan has a state; leaving the screening system is the absorbing state
+    plate_level, plate_result = (pd.Series(numpy_buffer(plate_sorted[column])).fillna('Unknown')
+                                 for column in ('scan_machine_level', 'scan_machine_result'))
+    plate_states = plate_level + ' ' + plate_result
+    state_codes, state_labels = pd.factorize(plate_states, sort=True)
+    n_states = len(state_labels)
+    exit_state = n_states
+    level_2_states = np.flatnonzero(state_labels.str.startswith('Level 2'))
+
+    # Every scan moves to the bag's next scan, or to the exit state after its last scan
+    plate_cluster_codes = pd.Categorical(plate_sorted['scan_machine_cluster'], categories=cluster_labels).codes
+    next_state_codes = np.where(next_is_same_bag, np.append(state_codes[1:], exit_state), exit_state)
+    is_first_scan = np.insert(plate_values[1:] != plate_values[:-1], 0, True)
+
+    # Transition groups: all scans, each cluster and each hour of the scan the bag moves from. Every scan is copied
+    # once per grouping; a scan without a cluster (code -1) only counts in 'All Scans' and its hour group
+    markov_group_labels = ['All Scans', *cluster_labels, *[f'{hour:02d}:00' for hour in range(24)]]
+    n_markov_groups = len(markov_group_labels)
+    scan_group_codes = np.concatenate([np.zeros(len(state_codes), dtype=np.int64), 1 + plate_cluster_codes,
+                                       1 + len(cluster_labels) + plate_hours])
+    in_scan_group = np.concatenate([np.ones(len(state_codes), dtype=bool), plate_cluster_codes >= 0,
+                                    np.ones(len(state_codes), dtype=bool)])
+    scan_group_codes = scan_group_codes[in_scan_group]
+    scan_group_rows = np.tile(np.arange(len(state_codes)), 3)[in_scan_group]
+    repeated_states = state_codes[scan_group_rows]
+
+    transition_counts = grouped_transition_counts(scan_group_codes, repeated_states,
+                                                  next_state_codes[scan_group_rows], n_markov_groups, n_states,
+                                                  n_states + 1)
+    is_first_group_scan = is_first_scan[scan_group_rows]
+    initial_counts = grouped_transition_counts(scan_group_codes[is_first_group_scan],
+                                               np.zeros(is_first_group_scan.sum(), dtype=np.int64),
+                                               repeated_states[is_first_group_scan],
+                                               n_markov_groups, 1, n_states)[:, 0, :]
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        transition_probabilities = np.nan_to_num(transition_counts / transition_counts.sum(axis=2, keepdims=True))
+        initial_distribution = np.nan_to_num(initial_counts / initial_counts.sum(axis=1, keepdims=True))
+
+    # Fundamental matrix N = (I - Q)^-1 of every group in one batched solve: expected visits to each state
+    transient_transitions = transition_probabilities[:, :, :n_states]
+    fundamental_matrix = solve_groups(np.eye(n_states) - transient_transitions,
+                                      np.broadcast_to(np.eye(n_states), transient_transitions.shape))
+    expected_visits = np.einsum('gi,gij->gj', initial_distribution, fundamental_matrix)
+
+    # Level 2 absorption: make the Level 2 states absorbing and solve for the probability of reaching them
+    non_level_2_states = np.setdiff1d(np.arange(n_states), level_2_states)
+    to_level_2 = transient_transitions[:, non_level_2_states][:, :, level_2_states].sum(axis=2)
+    reach_level_2 = solve_groups(
+        np.eye(len(non_level_2_states)) - transient_transitions[:, non_level_2_states][:, :, non_level_2_states],
+        to_level_2[:, :, None])[:, :, 0]
+
+    markov_summary = pd.DataFrame({
+        'Expected Scans per Bag': expected_visits.sum(axis=1),
+        'Expected Level 2 Scans per Bag': expected_visits[:, level_2_states].sum(axis=1),
+        'Probability of Reaching Level 2': (
+            initial_distribution[:, level_2_states].sum(axis=1) +
+            (initial_distribution[:, non_level_2_states] * reach_level_2).sum(axis=1)),
+        'First Scans': initial_counts.sum(axis=1)
+    }, index=pd.Index(markov_group_labels, name='Group'))
+    level_2_absorption = pd.DataFrame(reach_level_2.T, index=state_labels[non_level_2_states],
+                                      columns=markov_group_labels)
+
+    # Analytical Level 2 workload: Level 1 arrivals per hour of day times the expected Level 2 scans per bag
+    hour_groups = markov_summary.iloc[1 + len(cluster_labels):]
+    level_2_workload = pd.DataFrame({
+        'Predicted': (hour_groups['First Scans'].to_numpy() *
+                      hour_groups['Expected Level 2 Scans per Bag'].to_numpy()),
+        'Observed': np.bincount(plate_hours[np.isin(state_codes, level_2_states)], minlength=24)
+    }, index=range(24))
+    return state_labels, transition_probabilities, markov_summary, level_2_absorption, level_2_workload
+
+
+# Markov chain of every group, fitted once per process and scan source
+state_labels, transition_probabilities, markov_summary, level_2_absorption, level_2_workload = shared_data_product(
+    'markov_chain', scan_source_key, markov_chain_of_screening_states)
+
+# Heatmap of the transition probabilities of all scans
+fig_markov = px.imshow(
+    transition_probabilities[0],
+    x=[*state_labels, 'Exit'],
+    y=list(state_labels),
+    text_auto='.2f',
+    labels=dict(x='Next State', y='Current State', color='Probability'),
+    title='Transition Probabilities Between Screening States (All Scans)',
+    color_continuous_scale='Blues',
+    aspect='auto'
+)
+
+fig_markov.update_layout(width=width, height=height)
+
+st.plotly_chart(fig_markov)
+
+# Predicted versus observed Level 2 scans by hour of day
+fig_level_2_workload = px.line(
+    level_2_workload,
+    x=level_2_workload.index,
+    y=['Predicted', 'Observed'],
+    markers=True,
+    title='Level 2 Scans by Hour: Markov Prediction from Arrivals versus Observed',
+    labels={'x': 'Hour', 'value': 'Level 2 Scans', 'variable': 'Series'}
+)
+
+fig_level_2_workload.update_layout(
+    xaxis=dict(tickmode='linear', tickfont=dict(size=xtick_size), title=dict(font=dict(size=xlabel_size))),
+    yaxis=dict(tickfont=dict(size=ytick_size), title=dict(font=dict(size=ylabel_size))),
+    width=width,
+    height=height
+)
+
+st.plotly_chart(fig_level_2_workload)
+
+st.write("#### Markov Chain Summary per Group")
+st.dataframe(markov_summary.style.format({'Expected Scans per Bag': '{:.3f}', 'Expected Level 2 Scans per Bag': '{:.3f}',
+                                          'Probability of Reaching Level 2': '{:.3f}', 'First Scans': '{:,.0f}'}),
+             use_container_width=True)
+
+st.write("#### Probability of Reaching Level 2 from Each Level 1 State")
+st.dataframe(level_2_absorption[['All Scans', *cluster_labels]].style.format('{:.3f}'), use_container_width=True)
+
+st.markdown(f"""
+##### Markov Chain Insights
+- **Expected Scans per Bag:** `{markov_summary.loc['All Scans', 'Expected Scans per Bag']:.3f}`
+- **Probability a Bag Reaches Level 2:** `{markov_summary.loc['All Scans', 'Probability of Reaching Level 2']:.2%}`
+- **Expected Level 2 Scans per Arriving Bag:** `{markov_summary.loc['All Scans', 'Expected Level 2 Scans per Bag']:.3f}`
+
+Multiplying expected Level 1 arrivals by the expected Level 2 scans per bag predicts the Level 2 workload directly,
+without simulating individual bags. The hourly chart groups predictions by the hour of a bag's first scan and
+observations by the hour of the Level 2 scan.
+""")
+
 st.markdown(f"""## Chapter - 7""")
 
 st.markdown(f"""### Decision-Making Time""")
 st.write(" - How long does it take on average for operators to examine a bag at each machine?")
 
+
+# Function to compute the time between consecutive scans of each machine
+def machine_scan_gaps():
+    """
+    Sorts the scans by machine and time and adds the gap to the previous scan of the same machine, dropping the
+    first scan of every machine.
+    """
+    data_sorted = data.sort_values(by=['scan_machine_id', 'bag_scan_timestamp'])
+    data_sorted['time_diff'] = data_sorted.groupby('scan_machine_id')['bag_scan_timestamp'].diff()
+    data_sorted = data_sorted.dropna(subset=['time_diff'])
+    data_sorted['time_diff_seconds'] = data_sorted['time_diff'].dt.total_seconds()
+    return data_sorted
+
+
 # Calculate average time spent per machine (in minutes)
-data_sorted = data.sort_values(by=['scan_machine_id', 'bag_scan_timestamp'])
-data_sorted['time_diff'] = data_sorted.groupby('scan_machine_id')['bag_scan_timestamp'].diff()
-data_sorted = data_sorted.dropna(subset=['time_diff'])
-data_sorted['time_diff_seconds'] = data_sorted['time_diff'].dt.total_seconds()
+data_sorted = shared_data_product('machine_scan_gaps', scan_source_key, machine_scan_gaps)
 
 average_time_per_machine = data_sorted.groupby('scan_machine_id')['time_diff_seconds'].mean() / 60  # Convert to minutes
 average_time_df = average_time_per_machine.reset_index(name='average_time_minutes')
@@ -2558,10 +4716,7 @@ st.write("#### Average Decision-Making Time per Machine")
 st.plotly_chart(time_fig)
 
 # Box plot showing distribution of time spent per machine
-data_sorted = data.sort_values(by=['scan_machine_id', 'bag_scan_timestamp'])
-data_sorted['time_diff'] = data_sorted.groupby('scan_machine_id')['bag_scan_timestamp'].diff()
-data_sorted = data_sorted.dropna(subset=['time_diff'])
-data_sorted['time_diff_seconds'] = data_sorted['time_diff'].dt.total_seconds()
+data_sorted = shared_data_product('machine_scan_gaps', scan_source_key, machine_scan_gaps)
 
 # Box PlotDistribution of Time Spent per Bag at Each Machine
 st.write("### Distribution of Time Spent per Bag at Each Machine")
@@ -2782,10 +4937,10 @@ lower_bound = Q1 - 1.5 * IQR
 upper_bound = Q3 + 1.5 * IQR
 
 # Filter out the outliers
-filtered_data = data_sorted[
+filtered_data = shared_data_product('machine_scan_gaps_without_outliers', scan_source_key, lambda: data_sorted[
     (data_sorted['time_diff_seconds'] >= lower_bound[data_sorted['scan_machine_id']].values) &
     (data_sorted['time_diff_seconds'] <= upper_bound[data_sorted['scan_machine_id']].values)
-    ]
+    ])
 
 # Visualize the distribution of time spent per machine after outlier removal
 st.write("### Distribution of Time Spent per Bag at Each Machine (Outliers Removed)")
@@ -2903,6 +5058,437 @@ st.markdown(
     )
 )
 
+
+# Function to split each machine's scan stream into active sessions
+def sessionize_machine_scans(sorted_seconds, sorted_machine_codes, idle_threshold):
+    """
+    Splits machine-sorted scans into active sessions. A session starts at the first scan of each machine and after
+    every gap longer than the idle threshold. Returns the gap to the previous scan, the new-machine and
+    session-start flags, and the session id of every scan.
+    """
+    gaps = np.diff(sorted_seconds, prepend=sorted_seconds[:1]).astype(float)
+    new_machine = np.diff(sorted_machine_codes, prepend=-1) != 0
+    session_start = new_machine | (gaps > idle_threshold)
+    session_ids = np.cumsum(session_start) - 1
+    return gaps, new_machine, session_start, session_ids
+
+
+# Function to sum busy intervals into a machine x time bucket matrix
+def busy_seconds_matrix(start_seconds, end_seconds, interval_machine_codes, n_machines, origin_seconds,
+                        bucket_seconds, n_buckets):
+    """
+    Spreads busy intervals over fixed-size time buckets, however many buckets each one covers. The machine-sorted,
+    non-overlapping intervals are laid out on one time axis with each machine offset by the span of the buckets, the
+    busy seconds before every bucket edge come from one searchsorted over the interval ends, and their differences
+    are the busy seconds per machine and bucket.
+    """
+    busy = np.zeros((n_machines, n_buckets))
+    if len(start_seconds) == 0:
+        return busy
+    span = n_buckets * bucket_seconds
+    machine_offsets = np.asarray(interval_machine_codes, dtype=np.int64) * span - origin_seconds
+    starts = start_seconds + machine_offsets
+    ends = end_seconds + machine_offsets
+    busy_before_interval = np.concatenate([[0], np.cumsum(ends - starts)])
+    edges = (np.arange(n_machines)[:, None] * span + np.arange(n_buckets + 1)[None, :] * bucket_seconds).ravel()
+    ended = np.searchsorted(ends, edges, side='right')
+    current = np.minimum(ended, len(starts) - 1)
+    partial = np.where((ended < len(starts)) & (starts[current] < edges), edges - starts[current], 0)
+    busy_before_edge = (busy_before_interval[ended] + partial).reshape(n_machines, n_buckets + 1)
+    busy += np.diff(busy_before_edge, axis=1)
+    return busy
+
+
+# Monte Carlo settings, routing policies and the wait above which a bag counts as a long wait
+simulation_replicas = 200
+simulation_seed = 42
+simulation_routing_policies = ['Shared Queue', 'Round-Robin', 'Random']
+simulation_long_wait_seconds = 60
+simulation_wait_quantiles = [0.5, 0.9, 0.95, 0.99]
+service_quantile_points = 1001
+
+# Worker processes for the scenario runs (1 keeps everything in this process), set with SCAN_SIMULATION_WORKERS
+simulation_workers = os.environ.get('SCAN_SIMULATION_WORKERS', '1')
+if not simulation_workers.isdigit() or int(simulation_workers) < 1:
+    raise ValueError(f"Unknown SCAN_SIMULATION_WORKERS: {simulation_workers}")
+simulation_workers = int(simulation_workers)
+
+
+# Function to simulate one cluster's queue for one day over many replicas at once
+def simulate_cluster_queue(arrival_counts, service_table, routing, n_replicas, seed):
+    """
+    Draws Poisson arrivals for every 15-minute slot and replica, spreads them uniformly within the slot and routes
+    each bag to a machine by the routing policy. Service times are sampled from each machine's quantile table.
+    The queue recursion steps through the bags in arrival order with every replica handled in the same array
+    operation. Returns the wait-time quantiles, mean wait, long-wait share and the distribution of the queue
+    length seen by arriving bags.
+    """
+    rng = np.random.default_rng(seed)
+    n_servers, n_points = service_table.shape
+    n_slots = len(arrival_counts)
+
+    # Sorted arrival times per replica, padded with infinity up to the longest replica
+    slot_counts = rng.poisson(arrival_counts, size=(n_replicas, n_slots))
+    replica_totals = slot_counts.sum(axis=1)
+    max_arrivals = replica_totals.max()
+    arrival_replica = np.repeat(np.repeat(np.arange(n_replicas), n_slots), slot_counts.ravel())
+    arrival_slot = np.repeat(np.tile(np.arange(n_slots), n_replicas), slot_counts.ravel())
+    arrival_position = np.arange(len(arrival_replica)) - np.repeat(np.cumsum(replica_totals) - replica_totals,
+                                                                   replica_totals)
+    arrivals = np.full((n_replicas, max_arrivals), np.inf)
+    arrivals[arrival_replica, arrival_position] = (arrival_slot + rng.random(len(arrival_slot))) * 15 * 60
+    arrivals.sort(axis=1)
+
+    service_draws = rng.integers(0, n_points, size=(n_replicas, max_arrivals))
+    random_servers = rng.integers(0, n_servers, size=(n_replicas, max_arrivals))
+    free_at = np.zeros((n_replicas, n_servers))
+    starts = np.full((n_replicas, max_arrivals), np.nan)
+    replicas = np.arange(n_replicas)
+
+    for bag in range(max_arrivals):
+        arrival = arrivals[:, bag]
+        if routing == 'Shared Queue':
+            server = free_at.argmin(axis=1)
+        elif routing == 'Round-Robin':
+            server = np.full(n_replicas, bag % n_servers)
+        else:
+            server = random_servers[:, bag]
+        start = np.maximum(arrival, free_at[replicas, server])
+        arrived = np.isfinite(arrival)
+        free_at[replicas[arrived], server[arrived]] = (start + service_table[server, service_draws[:, bag]])[arrived]
+        starts[arrived, bag] = start[arrived]
+
+    # Queue length seen on arrival: earlier bags minus those already in service, via one offset searchsorted
+    arrived = np.isfinite(arrivals)
+    waits = (starts - arrivals)[arrived]
+    offset = np.nanmax(starts) + 2
+    sorted_starts = np.sort(np.nan_to_num(starts, nan=offset - 1), axis=1) + replicas[:, None] * offset
+    started = np.searchsorted(sorted_starts.ravel(), (arrivals + replicas[:, None] * offset)[arrived],
+                              side='left') - np.repeat(replicas * max_arrivals, replica_totals)
+    queue_lengths = arrival_position - started
+
+    return {
+        'wait_quantiles': np.quantile(waits, simulation_wait_quantiles),
+        'mean_wait': waits.mean(),
+        'long_wait_share': (waits > simulation_long_wait_seconds).mean(),
+        'queue_distribution': np.bincount(queue_lengths) / len(queue_lengths)
+    }
+
+
+# Function to run every outage scenario, cached by the arrivals, service tables, routing policies and seed
+@st.cache_data(show_spinner=False)
+def simulate_outage_scenarios(arrival_counts, service_tables, routings, n_replicas, seed, _workers=1):
+    """
+    Runs simulate_cluster_queue for every scenario with its own child seed, in a process pool when there is more than
+    one worker. Each scenario has its own seed, so the results do not depend on the worker count, which is left out
+    of the cache key.
+    """
+    seeds = np.random.SeedSequence(seed).spawn(len(routings))
+    arguments = [arrival_counts, service_tables, routings, [n_replicas] * len(routings), seeds]
+    if _workers > 1:
+        with ProcessPoolExecutor(max_workers=_workers) as pool:
+            return list(pool.map(simulate_cluster_queue, *arguments))
+    return list(map(simulate_cluster_queue, *arguments))
+
+
+# Machine-sorted scan stream as integer machine codes and epoch seconds
+machine_sorted_codes = machine_codes[machine_time_order]
+machine_sorted_seconds = scan_seconds[machine_time_order]
+
+# Arrivals follow the busiest day of throughput_by_15_min, split by cluster for the Level 1 machines
+simulation_day = pd.Timestamp(throughput_by_15_min.groupby(throughput_by_15_min.index.date).sum().idxmax())
+simulation_day_seconds = simulation_day.value // 10 ** 9
+simulation_scans = (scan_selection('scan_machine_level', ['Level 1'])[has_machine] &
+                    (scan_seconds >= simulation_day_seconds) &
+                    (scan_seconds < simulation_day_seconds + 24 * 60 * 60))
+simulation_arrivals = bincount_2d(cluster_codes[simulation_scans],
+                                  (scan_seconds[simulation_scans] - simulation_day_seconds) // (15 * 60),
+                                  len(cluster_labels), 24 * 4)
+
+# Scenarios: every Level 1 machine of the cluster up, and the cluster's busiest machine down
+simulation_scenarios = []
+for cluster_code, cluster_label in enumerate(cluster_labels):
+    cluster_machine_counts = np.bincount(machine_codes[simulation_scans & (cluster_codes == cluster_code)],
+                                         minlength=len(machine_labels))
+    cluster_machines = np.flatnonzero(cluster_machine_counts)
+    busiest_machine = cluster_machines[cluster_machine_counts[cluster_machines].argmax()]
+    for scenario, servers in [('All Machines Up', cluster_machines),
+                              (f'{machine_labels[busiest_machine]} Down',
+                               cluster_machines[cluster_machines != busiest_machine])]:
+        if len(servers) == 0:
+            continue
+        for routing in simulation_routing_policies:
+            simulation_scenarios.append((cluster_label, scenario, routing, simulation_arrivals[cluster_code], servers))
+
+
+# Machine sessions, utilization and the queue simulation; the idle threshold lives in a fragment so changing it
+# re-sessionizes the scans and re-runs these sections only, not the app
+@st.fragment
+def machine_sessions_and_queues():
+    """
+    Renders the idle threshold slider, splits the scans into sessions at it and shows the sessions, the machine
+    utilization and the queue simulation built on the resulting service times.
+    """
+    # Machine Activity Sessions and Idle Gaps
+    st.write("### Machine Activity Sessions and Idle Gaps")
+    st.write(" - How much of each machine's time is spent actively screening, and how much is idle?")
+
+    # Gaps longer than the idle threshold (overnight closures, breaks) end an active session
+    idle_threshold_minutes = st.slider("Idle threshold (minutes)", min_value=1, max_value=60, value=5,
+                                       help="A gap between two scans of a machine longer than this ends its session.")
+    idle_threshold_seconds = idle_threshold_minutes * 60
+
+    session_gaps, session_new_machine, session_start, session_ids = sessionize_machine_scans(
+        machine_sorted_seconds, machine_sorted_codes, idle_threshold_seconds)
+
+    # Gaps inside a session are true per-bag service times, gaps between sessions are idle time
+    in_session_gap = ~session_start
+    idle_gap = session_start & ~session_new_machine
+    n_session_machines = len(machine_labels)
+
+    machine_sessions = pd.DataFrame({
+        'sessions': np.bincount(machine_sorted_codes[session_start], minlength=n_session_machines),
+        'busy_hours': np.bincount(machine_sorted_codes, weights=session_gaps * in_session_gap,
+                                  minlength=n_session_machines) / 3600,
+        'idle_hours': np.bincount(machine_sorted_codes, weights=session_gaps * idle_gap,
+                                  minlength=n_session_machines) / 3600,
+        'service_times': np.bincount(machine_sorted_codes[in_session_gap], minlength=n_session_machines)
+    }, index=pd.Index(machine_labels, name='scan_machine_id'))
+
+    machine_sessions['busy_percentage'] = (machine_sessions['busy_hours'] * 100 /
+                                           (machine_sessions['busy_hours'] + machine_sessions['idle_hours']))
+    machine_sessions['mean_service_seconds'] = (machine_sessions['busy_hours'] * 3600 /
+                                                machine_sessions['service_times'])
+    machine_sessions['median_service_seconds'] = pd.Series(session_gaps[in_session_gap]).groupby(
+        machine_labels[machine_sorted_codes[in_session_gap]]).median()
+
+    # Session lengths for the distribution plot
+    session_first_scan = np.flatnonzero(session_start)
+    session_last_scan = np.append(session_first_scan[1:], len(session_ids)) - 1
+    session_durations_minutes = (machine_sorted_seconds[session_last_scan] -
+                                 machine_sorted_seconds[session_first_scan]) / 60
+
+    # Stacked bar of busy and idle hours per machine
+    fig_sessions = px.bar(
+        machine_sessions,
+        x=machine_sessions.index,
+        y=['busy_hours', 'idle_hours'],
+        title='Busy and Idle Hours per Machine',
+        labels={'x': 'Machine ID', 'value': 'Hours', 'variable': 'State'},
+        color_discrete_map={'busy_hours': '#D50000', 'idle_hours': '#D3D3D3'}
+    )
+
+    fig_sessions.update_layout(
+        xaxis=dict(
+            tickangle=0,
+            tickfont=dict(size=xtick_size),
+            title=dict(text='Machine ID', font=dict(size=xlabel_size))
+        ),
+        yaxis=dict(
+            tickfont=dict(size=ytick_size),
+            title=dict(text='Hours', font=dict(size=ylabel_size))
+        ),
+        width=width,
+        height=height
+    )
+
+    st.plotly_chart(fig_sessions)
+
+    # Distribution of session durations
+    fig_session_durations = px.histogram(
+        x=session_durations_minutes,
+        nbins=50,
+        title='Distribution of Active Session Durations',
+        labels={'x': 'Session Duration (minutes)'}
+    )
+
+    fig_session_durations.update_layout(
+        xaxis=dict(
+            tickfont=dict(size=xtick_size),
+            title=dict(text='Session Duration (minutes)', font=dict(size=xlabel_size))
+        ),
+        yaxis=dict(
+            tickfont=dict(size=ytick_size),
+            title=dict(text='Number of Sessions', font=dict(size=ylabel_size))
+        ),
+        width=width,
+        height=height
+    )
+
+    st.plotly_chart(fig_session_durations)
+
+    st.write("#### Machine Sessions Summary")
+    st.dataframe(
+        machine_sessions.reset_index().style.format({
+            'busy_hours': '{:.1f}', 'idle_hours': '{:.1f}', 'busy_percentage': '{:.1f}%',
+            'mean_service_seconds': '{:.1f}', 'median_service_seconds': '{:.1f}'
+        }),
+        use_container_width=True
+    )
+
+    st.markdown(f"""
+##### Machine Activity Sessions Insights
+Splitting each machine's scan stream at gaps longer than `{idle_threshold_seconds // 60}` minutes separates active
+screening from overnight closures and breaks, so no outlier trimming is needed:
+- **Total Active Sessions:** `{machine_sessions['sessions'].sum():,}`
+- **Median Session Duration:** `{np.median(session_durations_minutes):.1f}` minutes
+- **Busiest Machine (Share of Time Busy):** `{machine_sessions['busy_percentage'].idxmax()}`
+(`{machine_sessions['busy_percentage'].max():.1f}%`)
+- **Least Busy Machine (Share of Time Busy):** `{machine_sessions['busy_percentage'].idxmin()}`
+(`{machine_sessions['busy_percentage'].min():.1f}%`)
+- **Mean Service Time Across Machines:** `{session_gaps[in_session_gap].mean():.1f}` seconds per bag
+""")
+
+    # Machine Utilization (Busy-Time Percentage) by Hour and Day
+    st.write("### Machine Utilization by Hour and Day")
+    st.write(" - What percentage of the time is each machine busy screening bags?")
+
+    # Busy intervals are the in-session gaps between consecutive scans of the same machine
+    busy_end_seconds = machine_sorted_seconds[in_session_gap]
+    busy_start_seconds = busy_end_seconds - session_gaps[in_session_gap].astype(np.int64)
+    busy_machine_codes = machine_sorted_codes[in_session_gap]
+
+    # Buckets are aligned to midnight of the first day in the data
+    utilization_matrices = {}
+    for bucket_label, bucket_seconds in [('15-Minute', 15 * 60), ('Hourly', 60 * 60)]:
+        scan_buckets, utilization_origin = midnight_buckets(machine_sorted_seconds, bucket_seconds)
+        n_buckets = scan_buckets.max() + 2
+        busy = busy_seconds_matrix(busy_start_seconds, busy_end_seconds, busy_machine_codes, n_session_machines,
+                                   utilization_origin, bucket_seconds, n_buckets)
+        bucket_times = pd.to_datetime(utilization_origin + np.arange(n_buckets) * bucket_seconds, unit='s')
+        utilization_matrices[bucket_label] = pd.DataFrame(busy * 100 / bucket_seconds,
+                                                          index=machine_labels, columns=bucket_times)
+
+    utilization_15_min = utilization_matrices['15-Minute']
+    utilization_hourly = utilization_matrices['Hourly']
+
+    # Average utilization per machine by hour of day and by calendar day
+    utilization_by_hour_of_day = utilization_hourly.T.groupby(utilization_hourly.columns.hour).mean().T
+    utilization_by_day = utilization_hourly.T.groupby(utilization_hourly.columns.date).mean().T
+    peak_15_min_utilization = utilization_15_min.max(axis=1)
+
+    # Heatmap of utilization by machine and hour of day
+    fig_utilization_hour = px.imshow(
+        utilization_by_hour_of_day,
+        labels=dict(x='Hour', y='Machine ID', color='Busy (%)'),
+        title='Average Machine Utilization (% of Time Busy) by Hour of Day',
+        color_continuous_scale='Reds',
+        aspect='auto'
+    )
+
+    fig_utilization_hour.update_layout(
+        xaxis=dict(tickmode='linear', tickfont=dict(size=xtick_size), title=dict(font=dict(size=xlabel_size))),
+        yaxis=dict(tickfont=dict(size=ytick_size), title=dict(font=dict(size=ylabel_size))),
+        width=width,
+        height=height
+    )
+
+    st.plotly_chart(fig_utilization_hour)
+
+    # Heatmap of utilization by machine and day
+    fig_utilization_day = px.imshow(
+        utilization_by_day,
+        labels=dict(x='Day', y='Machine ID', color='Busy (%)'),
+        title='Average Machine Utilization (% of Time Busy) by Day',
+        color_continuous_scale='Reds',
+        aspect='auto'
+    )
+
+    fig_utilization_day.update_layout(
+        xaxis=dict(tickfont=dict(size=xtick_size), title=dict(font=dict(size=xlabel_size))),
+        yaxis=dict(tickfont=dict(size=ytick_size), title=dict(font=dict(size=ylabel_size))),
+        width=width,
+        height=height
+    )
+
+    st.plotly_chart(fig_utilization_day)
+
+    st.markdown(f"""
+##### Machine Utilization Insights
+- **Highest Average Utilization:** `{utilization_hourly.mean(axis=1).idxmax()}`
+(`{utilization_hourly.mean(axis=1).max():.1f}%` of the time busy)
+- **Lowest Average Utilization:** `{utilization_hourly.mean(axis=1).idxmin()}`
+(`{utilization_hourly.mean(axis=1).min():.1f}%` of the time busy)
+- **Busiest Hour Across Machines:** `{utilization_by_hour_of_day.mean().idxmax()}:00`
+(`{utilization_by_hour_of_day.mean().max():.1f}%` average utilization)
+- **Highest 15-Minute Utilization:** `{peak_15_min_utilization.idxmax()}`
+(`{peak_15_min_utilization.max():.1f}%`)
+
+Unlike the raw bag counts per machine in Chapter 4, these figures measure how much of the time each machine is busy,
+which is the quantity capacity planning needs.
+""")
+
+    # Queue Simulation of Machine Outages
+    st.write("### Queue Simulation of Machine Outages")
+    st.write(" - What happens to queues and waiting times at each cluster if a machine is down on the busiest day?")
+
+    # Per-machine service-time quantile table from the in-session gaps, with one lexsort instead of a loop per machine
+    service_gaps = session_gaps[in_session_gap]
+    service_machine_codes = machine_sorted_codes[in_session_gap]
+    service_counts = np.bincount(service_machine_codes, minlength=n_session_machines)
+    service_offsets = np.concatenate([[0], np.cumsum(service_counts)[:-1]])
+    service_positions = service_offsets[:, None] + np.round(
+        np.linspace(0, 1, service_quantile_points)[None, :] * np.maximum(service_counts[:, None] - 1, 0)).astype(int)
+    service_quantile_table = service_gaps[np.lexsort((service_gaps, service_machine_codes))][
+        np.minimum(service_positions, len(service_gaps) - 1)]
+
+    # The runs are cached, so returning to an idle threshold shown before reuses its results
+    simulation_results = simulate_outage_scenarios(
+        [scenario[3] for scenario in simulation_scenarios],
+        [service_quantile_table[scenario[4]] for scenario in simulation_scenarios],
+        [scenario[2] for scenario in simulation_scenarios], simulation_replicas, simulation_seed,
+        _workers=simulation_workers)
+
+    queue_simulation_summary = pd.DataFrame([
+        {'Cluster': cluster_label, 'Scenario': scenario, 'Routing': routing,
+         'Mean Wait (seconds)': result['mean_wait'],
+         **{f'P{quantile * 100:g} Wait (seconds)': value
+            for quantile, value in zip(simulation_wait_quantiles, result['wait_quantiles'])},
+         f'Waits over {simulation_long_wait_seconds}s (%)': result['long_wait_share'] * 100,
+         'Mean Queue Length': (np.arange(len(result['queue_distribution'])) * result['queue_distribution']).sum()}
+        for (cluster_label, scenario, routing, _, _), result in zip(simulation_scenarios, simulation_results)
+    ])
+    queue_length_distribution = pd.concat([
+        pd.DataFrame({'Cluster': cluster_label, 'Scenario': scenario, 'Routing': routing,
+                      'Queue Length': np.arange(len(result['queue_distribution'])),
+                      'Probability': result['queue_distribution']})
+        for (cluster_label, scenario, routing, _, _), result in zip(simulation_scenarios, simulation_results)
+    ], ignore_index=True)
+
+    # Distribution of the queue length seen by arriving bags per cluster, scenario and routing policy
+    fig_queue_lengths = px.line(
+        queue_length_distribution,
+        x='Queue Length',
+        y='Probability',
+        color='Scenario',
+        line_dash='Routing',
+        facet_col='Cluster',
+        title=f'Queue Length Seen by Arriving Bags on {simulation_day.date()} ({simulation_replicas} Replicas)'
+    )
+
+    fig_queue_lengths.update_layout(width=width, height=height)
+
+    st.plotly_chart(fig_queue_lengths)
+
+    st.write("#### Simulated Waiting Times per Scenario")
+    st.dataframe(queue_simulation_summary.style.format(precision=2), use_container_width=True)
+
+    worst_scenario = queue_simulation_summary.loc[queue_simulation_summary['Mean Wait (seconds)'].idxmax()]
+    st.markdown(f"""
+##### Queue Simulation Insights
+- **Simulated Day:** `{simulation_day.date()}`, the busiest day in the data, with arrivals drawn from its 15-minute
+throughput and service times drawn from each machine's in-session scan gaps.
+- **Worst Scenario:** `{worst_scenario['Scenario']}` in `{worst_scenario['Cluster']}` with `{worst_scenario['Routing']}`
+routing, averaging `{worst_scenario['Mean Wait (seconds)']:.1f}` seconds of waiting per bag.
+
+Comparing each outage with the matching all-machines-up run shows how much slack a cluster has to absorb a machine
+failure, and comparing routing policies shows how much a shared queue recovers of that slack.
+Adjust the idle threshold above to re-run these sections.
+""")
+
+
+machine_sessions_and_queues()
+
 st.markdown(f"""## Chapter - 8""")
 st.markdown(f"""### Operator Interventions""")
 
@@ -2911,7 +5497,8 @@ st.write(" - What percentage of bags require operator intervention, "
 st.write(" - Are operator interventions more frequent during specific times or at certain machines?")
 
 # Filter for bags that required operator intervention
-intervention_data = data[data['scan_machine_result'].isin(['Unclear', 'Rejected'])]
+intervention_data = shared_data_product('intervention_data', scan_source_key,
+                                        lambda: data[is_intervention_scan])
 
 # Calculate the percentage of bags requiring operator intervention
 total_bags = len(data)
@@ -2919,7 +5506,7 @@ intervention_bags = len(intervention_data)
 intervention_percentage = (intervention_bags / total_bags) * 100
 
 # Count the reasons for intervention
-intervention_reasons = intervention_data['scan_machine_result_reason'].value_counts()
+intervention_reasons = numpy_backed(intervention_data['scan_machine_result_reason'].value_counts())
 
 # Pie Chart Percentage of Bags Requiring Operator Intervention
 st.write("### Percentage of Bags Requiring Operator Intervention")
@@ -3009,7 +5596,7 @@ summary_statistics_df = pd.DataFrame(summary_statistics).reset_index()
 summary_statistics_df.columns = ['Scan Result', 'Percentage']
 
 # Add total counts for better context
-summary_statistics_df['Count'] = data['scan_machine_result'].value_counts().values
+summary_statistics_df['Count'] = numpy_backed(data['scan_machine_result'].value_counts()).values
 
 # Sort the summary statistics dataframe by the 'Percentage' column in descending order
 sorted_summary = summary_statistics_df.sort_values(by='Percentage', ascending=False)
@@ -3047,7 +5634,7 @@ fig_pie.update_layout(
 st.plotly_chart(fig_pie)
 
 # Group by machine ID and scan result, and calculate success/failure rates
-machine_performance = data.groupby(['scan_machine_id', 'scan_machine_result']).size().unstack(fill_value=0)
+machine_performance = chapter_aggregate('machine_performance')
 machine_performance_normalized = round(machine_performance.div(machine_performance.sum(axis=1), axis=0) * 100, 2)
 
 # Create an array to store machine IDs for easier indexing
@@ -3154,11 +5741,12 @@ st.plotly_chart(level_chart, use_container_width=True)
 
 # Calculate metrics for intervention reasons
 # Filter out rows where 'scan_machine_result_reason' is None
-filtered_data = data[data['scan_machine_result_reason'].notna()]
+filtered_data = shared_data_product('scans_with_result_reason', scan_source_key,
+                                   lambda: data[data['scan_machine_result_reason'].notna()])
 
 # Calculate value counts and percentages
 intervention_reasons = filtered_data['scan_machine_result_reason'].value_counts(normalize=True) * 100
-intervention_counts = filtered_data['scan_machine_result_reason'].value_counts()
+intervention_counts = numpy_backed(filtered_data['scan_machine_result_reason'].value_counts())
 
 # Sort reasons by frequency
 sorted_reasons = intervention_reasons.sort_values(ascending=False)
@@ -3261,6 +5849,198 @@ Analyzing temporal and machine-level patterns reveals the following insights:
    `{middle_frequent_reason}` to enhance decision accuracy and speed.  
 """)
 
+# Operator Shift Schedule Optimizer
+st.write("### Operator Shift Schedule Optimizer")
+st.write(" - How many operators should start a shift at each hour of the week to cover the expected Level 2 "
+         "escalations and operator interventions?")
+
+hours_per_week = 7 * 24
+
+# Expected volumes per hour of the week: counts divided by the number of observed days of that weekday
+observed_days = pd.DatetimeIndex(data['bag_scan_timestamp'].dt.normalize().unique())
+weekday_day_counts = np.maximum(np.bincount(observed_days.weekday, minlength=7), 1)
+week_hour_labels = [f'{day[:3]} {hour:02d}:00' for day in weekday_order for hour in range(24)]
+
+
+# Function to average a subset of scans into expected volumes per hour of the week
+def expected_hourly_volume(timestamps):
+    """
+    Counts the scans in every (weekday, hour) cell with one bincount and divides by the number of days of that
+    weekday in the data, giving the expected volume for each of the 168 hours of a week.
+    """
+    week_hours = timestamps.dt.weekday.to_numpy() * 24 + timestamps.dt.hour.to_numpy()
+    return np.bincount(week_hours, minlength=hours_per_week) / np.repeat(weekday_day_counts, 24)
+
+
+# Expected Level 2 and intervention volumes per hour of the week, computed once per process and scan source
+expected_level_2_volume, expected_intervention_volume = shared_data_product(
+    'expected_operator_demand', scan_source_key,
+    lambda: (expected_hourly_volume(level_2_data['bag_scan_timestamp']),
+             expected_hourly_volume(intervention_data['bag_scan_timestamp'])))
+
+
+# Function to find the fewest operator shifts covering every hour of the week, cached per set of planner inputs
+@st.cache_data(show_spinner=False)
+def optimize_shift_schedule(required_operators, shift_length, max_on_duty, allowed_start_hours, time_limit=10):
+    """
+    Solves an integer program with one variable per shift start hour of the week (shifts wrap from Sunday into
+    Monday). Every hour must be covered by at least the required number of operators and at most max_on_duty,
+    shifts may only start at the allowed hours of the day, and the objective is the total number of shifts.
+    Returns the SciPy result and the (hour x start) coverage matrix.
+    """
+    week_hours = np.arange(hours_per_week)
+    coverage = ((week_hours[:, None] - week_hours[None, :]) % hours_per_week < shift_length).astype(float)
+    start_allowed = np.isin(week_hours % 24, allowed_start_hours)
+    result = milp(
+        c=np.ones(hours_per_week),
+        constraints=LinearConstraint(coverage, lb=required_operators, ub=max_on_duty),
+        integrality=np.ones(hours_per_week),
+        bounds=Bounds(0, np.where(start_allowed, np.inf, 0)),
+        options={'time_limit': time_limit}
+    )
+    return result, coverage
+
+
+# Shift schedule planner; the inputs live in a fragment so changing them re-solves only the schedule, not the app
+@st.fragment
+def shift_schedule_planner():
+    """
+    Renders the planner inputs, solves the week for them and shows the schedule, required versus scheduled
+    operators and the schedule insights.
+    """
+    planner_col1, planner_col2, planner_col3 = st.columns(3)
+    with planner_col1:
+        level_2_handling_minutes = st.number_input('Minutes per Level 2 escalation', min_value=0.5, value=3.0,
+                                                   step=0.5)
+        intervention_handling_minutes = st.number_input('Minutes per operator intervention', min_value=0.5,
+                                                        value=2.0, step=0.5)
+    with planner_col2:
+        shift_length_hours = st.selectbox('Shift length (hours)', [4, 6, 8, 10, 12], index=2)
+        target_operator_utilization = st.slider('Target operator utilization', min_value=0.3, max_value=1.0,
+                                                value=0.8, step=0.05)
+    with planner_col3:
+        min_operators_on_duty = st.number_input('Minimum operators on duty', min_value=0, value=1, step=1)
+        max_operators_on_duty = st.number_input('Maximum operators on duty', min_value=1, value=20, step=1)
+    allowed_shift_starts = st.multiselect('Allowed shift start hours', list(range(24)), default=list(range(24)))
+
+    # Operators needed per hour: handling workload at the target utilization, never below the minimum on duty
+    operator_workload_hours = (expected_level_2_volume * level_2_handling_minutes +
+                               expected_intervention_volume * intervention_handling_minutes) / 60
+    required_operators = np.maximum(np.ceil(operator_workload_hours / target_operator_utilization - 1e-9),
+                                    min_operators_on_duty)
+
+    schedule_result, shift_coverage = optimize_shift_schedule(required_operators, shift_length_hours,
+                                                              max_operators_on_duty, allowed_shift_starts)
+
+    if schedule_result.x is None:
+        st.error(f"No schedule satisfies these constraints ({schedule_result.message}). Allow more shift start hours "
+                 f"or raise the maximum operators on duty.")
+    else:
+        shift_starts = np.round(schedule_result.x).astype(int)
+        operators_on_duty = (shift_coverage @ shift_starts).astype(int)
+
+        # Required versus scheduled operators for every hour of the week
+        fig_schedule = go.Figure()
+        fig_schedule.add_bar(x=week_hour_labels, y=operators_on_duty, name='Scheduled Operators',
+                             marker_color='lightblue')
+        fig_schedule.add_scatter(x=week_hour_labels, y=required_operators, mode='lines', name='Required Operators',
+                                 line=dict(color='red', shape='hv'))
+        fig_schedule.update_layout(
+            title=f'Required and Scheduled Operators per Hour of the Week ({shift_length_hours}-Hour Shifts)',
+            xaxis=dict(tickfont=dict(size=10), title=dict(text='Hour of Week', font=dict(size=xlabel_size)),
+                       tickvals=week_hour_labels[::6]),
+            yaxis=dict(tickfont=dict(size=ytick_size), title=dict(text='Operators', font=dict(size=ylabel_size))),
+            width=width,
+            height=height
+        )
+
+        st.plotly_chart(fig_schedule)
+
+        shift_start_table = pd.DataFrame(shift_starts.reshape(7, 24), index=weekday_order, columns=range(24))
+        st.write("#### Shifts Starting per Day and Hour")
+        st.dataframe(shift_start_table.loc[:, shift_start_table.sum() > 0], use_container_width=True)
+
+        st.markdown(f"""
+##### Shift Schedule Insights
+- **Shifts per Week:** `{shift_starts.sum():,}` ({shift_starts.sum() * shift_length_hours:,} operator-hours)
+- **Required Operator-Hours:** `{required_operators.sum():,.0f}`
+- **Over-Coverage:** `{(operators_on_duty - required_operators).sum():,.0f}` operator-hours scheduled beyond the
+requirement, the price of whole {shift_length_hours}-hour shifts
+- **Peak Operators on Duty:** `{operators_on_duty.max():,}` on `{week_hour_labels[operators_on_duty.argmax()]}`
+
+The requirement comes from the average Level 2 escalations and operator interventions in each hour of the week,
+handling times and a target utilization. Adjust the inputs above to re-solve the week.
+""")
+
+
+shift_schedule_planner()
+
+
+# Backend Parity Check
+st.write("### Backend Parity Check")
+st.write(" - Do the pandas, NumPy, Polars and SQL backends produce identical chapter aggregates, and which one is "
+         "fastest on this dataset?")
+
+
+# Function to compute every chapter aggregate and the statistics derived from them on one backend
+def backend_parity_results(backend):
+    """
+    Evaluates all chapter aggregates on the backend without the query cache, then derives the Level 2 proportions
+    per machine, the recirculation counts and the 15-minute throughput interval statistics from them.
+    """
+    results = {name: chapter_aggregate(name, backend, cached=False) for name in chapter_aggregates}
+    return {**results, **derived_statistics(results)}
+
+
+# Function to report whether two aggregates are identical in values, index, order and dtypes
+def aggregates_identical(expected, actual):
+    """
+    Uses the pandas testing assertions, so a differing dtype, index name or row order counts as a mismatch.
+    """
+    try:
+        if isinstance(expected, pd.DataFrame):
+            pd.testing.assert_frame_equal(expected, actual)
+        else:
+            pd.testing.assert_series_equal(expected, actual)
+    except AssertionError:
+        return False
+    return True
+
+
+if st.checkbox("Run the backend parity check", value=False):
+    available_backends = [backend for backend in aggregate_backends
+                          if optional_backend_modules.get(backend, np) is not None]
+    parity_results, parity_seconds = {}, {}
+    for backend in available_backends:
+        prepare_backend(backend)
+        started = time.perf_counter()
+        parity_results[backend] = backend_parity_results(backend)
+        parity_seconds[backend] = time.perf_counter() - started
+
+    parity_table = pd.DataFrame({
+        backend: {name: aggregates_identical(parity_results['pandas'][name], result)
+                  for name, result in results.items()}
+        for backend, results in parity_results.items()
+    })
+    st.write("#### Identical to pandas")
+    st.dataframe(parity_table, use_container_width=True)
+
+    st.write("#### Seconds for All Aggregates")
+    st.dataframe(pd.DataFrame({'Seconds': parity_seconds}).T.style.format('{:.3f}'), use_container_width=True)
+
+    mismatched_backends = [backend for backend in available_backends if not parity_table[backend].all()]
+    fastest_backend = min(parity_seconds, key=parity_seconds.get)
+    st.markdown(f"""
+##### Backend Parity Insights
+- **Backends Checked:** `{', '.join(available_backends)}` (configured: `{scan_data_backend}`)
+- **Aggregates Compared:** `{len(parity_table)}` chapter aggregates and derived statistics against pandas
+- **Mismatches:** `{', '.join(mismatched_backends) if mismatched_backends else 'none'}`
+- **Fastest Backend:** `{fastest_backend}` at `{parity_seconds[fastest_backend]:.3f}` seconds for all aggregates
+
+Timings exclude preparing each backend (the Polars copy, loading the SQL database file) and bypass the query cache.
+Set `SCAN_DATA_BACKEND` to the fastest backend without mismatches for this deployment.
+""")
+
 
 # Main
 if __name__ == "__main__":
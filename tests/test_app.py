@@ -0,0 +1,34 @@
+"""
+
+    test_app.py
+
+    Runs the whole Streamlit app on the fixture CSV, from the CSV and from the column store, and checks that every
+    chapter renders without an exception.
+
+"""
+
+
+import os
+import shutil
+
+import pytest
+
+AppTest = pytest.importorskip('streamlit.testing.v1').AppTest
+
+repository_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+fixture_csv_path = os.path.join(repository_path, 'tests', 'data', 'scan_data.csv')
+
+
+@pytest.mark.parametrize('data_source', ['csv', 'columns'])
+def test_app_runs_on_fixture(data_source, tmp_path, monkeypatch):
+    # The column store is written next to the CSV, so each run reads its own copy
+    csv_path = str(tmp_path / 'scan_data.csv')
+    shutil.copy(fixture_csv_path, csv_path)
+    monkeypatch.chdir(repository_path)
+    monkeypatch.setenv('SCAN_DATA_CSV', csv_path)
+    monkeypatch.setenv('SCAN_DATA_SOURCE', data_source)
+
+    app = AppTest.from_file(os.path.join(repository_path, 'streamlit_app.py'), default_timeout=300).run()
+
+    assert [exception.message for exception in app.exception] == []
+    assert any('Data analysis complete' in markdown.value for markdown in app.markdown)
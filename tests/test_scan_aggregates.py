@@ -0,0 +1,89 @@
+"""
+
+    test_scan_aggregates.py
+
+    Runs every backend on a small fixture CSV and checks that the chapter aggregates and the statistics derived from
+    them are identical to pandas.
+
+"""
+
+
+import os
+
+import pandas as pd
+import pytest
+
+from scan_aggregates import (add_time_keys, chapter_aggregates, derived_statistics, evaluate_chapter_aggregate,
+                             execute_aggregate_query, polars_scan_table, prepare_sql_backend)
+
+fixture_csv_path = os.path.join(os.path.dirname(__file__), 'data', 'scan_data.csv')
+
+
+coded_columns = ['bag_licence_plate', 'scan_machine_id', 'scan_machine_cluster', 'scan_machine_level',
+                 'scan_machine_result', 'scan_machine_result_reason']
+
+
+# The column store hands the coded columns to the app as categoricals
+@pytest.fixture(scope='module', params=['object', 'categorical'])
+def scan_table(request):
+    frame = add_time_keys(pd.read_csv(fixture_csv_path))
+    if request.param == 'categorical':
+        frame = frame.astype({column: 'category' for column in coded_columns})
+    return frame
+
+
+def backend_source(backend, frame, tmp_path):
+    if backend == 'polars':
+        pytest.importorskip('polars')
+        return polars_scan_table(frame)
+    if backend in ('sqlite', 'duckdb'):
+        if backend == 'duckdb':
+            pytest.importorskip('duckdb')
+        database_path = str(tmp_path / f'scan_data.{backend}')
+        prepare_sql_backend(backend, database_path, 'fixture', frame)
+        return database_path
+    return None
+
+
+def backend_aggregates(backend, frame, source):
+    aggregates = {name: evaluate_chapter_aggregate(name, backend, frame, source) for name in chapter_aggregates}
+    return {**aggregates, **derived_statistics(aggregates)}
+
+
+@pytest.mark.parametrize('backend', ['numpy', 'polars', 'sqlite', 'duckdb'])
+def test_backend_matches_pandas(backend, scan_table, tmp_path):
+    expected = backend_aggregates('pandas', scan_table, None)
+    actual = backend_aggregates(backend, scan_table, backend_source(backend, scan_table, tmp_path))
+
+    assert set(actual) == set(expected)
+    for name in expected:
+        if isinstance(expected[name], pd.DataFrame):
+            pd.testing.assert_frame_equal(actual[name], expected[name], obj=name)
+        else:
+            pd.testing.assert_series_equal(actual[name], expected[name], obj=name)
+
+
+@pytest.mark.parametrize('backend', ['pandas', 'numpy', 'polars', 'sqlite', 'duckdb'])
+def test_missing_keys_are_dropped(backend, scan_table, tmp_path):
+    bags_per_machine = evaluate_chapter_aggregate('bags_per_machine', backend, scan_table,
+                                                  backend_source(backend, scan_table, tmp_path))
+
+    assert scan_table['scan_machine_id'].isna().any()
+    assert bags_per_machine.sum() == scan_table['scan_machine_id'].notna().sum()
+
+
+def test_fixture_covers_derived_statistics(scan_table):
+    aggregates = backend_aggregates('pandas', scan_table, None)
+
+    assert aggregates['level_2_proportions'].notna().any()
+    assert aggregates['recirculation_frequency'].sum() > 0
+
+
+def test_sql_backend_reloads_changed_source(scan_table, tmp_path):
+    database_path = str(tmp_path / 'scan_data.sqlite')
+    prepare_sql_backend('sqlite', database_path, 'first', scan_table.head(10))
+    prepare_sql_backend('sqlite', database_path, 'first', scan_table)
+    assert execute_aggregate_query('sqlite', database_path, 'SELECT COUNT(*) FROM scans', ()) == [(10,)]
+
+    prepare_sql_backend('sqlite', database_path, 'second', scan_table)
+    assert execute_aggregate_query('sqlite', database_path, 'SELECT COUNT(*) FROM scans', ()) == [(len(scan_table),)]
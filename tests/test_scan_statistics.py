@@ -0,0 +1,94 @@
+"""
+
+    test_scan_statistics.py
+
+    Checks the mean, proportion and bootstrap rate intervals against known values, and that the calibrated CUSUM
+    rarely alarms on noise but finds a level shift.
+
+"""
+
+
+import numpy as np
+import pytest
+import scipy.stats as stats
+
+from scan_statistics import (batched_cusum, bootstrap_rate_intervals, cusum_threshold,
+                             grouped_mean_confidence_interval, proportion_confidence_interval, standardize_panel)
+
+
+def test_mean_interval_matches_t_distribution():
+    intervals = grouped_mean_confidence_interval([1, 2, 3, 4, 5])
+    assert intervals.loc[0, 'mean'] == pytest.approx(3)
+    assert intervals.loc[0, 'std'] == pytest.approx(np.sqrt(2.5))
+    assert intervals.loc[0, ['ci_lower', 'ci_upper']].tolist() == pytest.approx([1.0368, 4.9632], abs=1e-4)
+
+
+def test_grouped_mean_intervals_match_scipy():
+    values = np.array([4.0, 7.0, 5.0, 9.0, 12.0, 10.0, 11.0])
+    group_codes = np.array([0, 0, 0, 1, 1, 1, 1])
+    intervals = grouped_mean_confidence_interval(values, group_codes, confidence_level=0.9)
+    for group in (0, 1):
+        group_values = values[group_codes == group]
+        expected = stats.t.interval(0.9, len(group_values) - 1, loc=group_values.mean(),
+                                    scale=stats.sem(group_values))
+        assert intervals.loc[group, ['ci_lower', 'ci_upper']].tolist() == pytest.approx(expected)
+
+
+@pytest.mark.parametrize('successes, trials, expected', [
+    (5, 10, (0.2366, 0.7634)),
+    (2, 10, (0.0567, 0.5098)),
+    (0, 10, (0.0, 0.2775)),
+    (10, 10, (0.7225, 1.0))
+])
+def test_wilson_interval(successes, trials, expected):
+    intervals = proportion_confidence_interval([successes], [trials])
+    assert intervals.loc[0, ['ci_lower', 'ci_upper']].tolist() == pytest.approx(expected, abs=1e-4)
+
+
+def test_agresti_coull_interval():
+    intervals = proportion_confidence_interval([5, 2], [10, 10], method='agresti-coull')
+    assert intervals[['ci_lower', 'ci_upper']].to_numpy() == pytest.approx(np.array([[0.2366, 0.7634],
+                                                                                     [0.0459, 0.5206]]), abs=1e-4)
+
+
+def test_unknown_interval_method():
+    with pytest.raises(ValueError):
+        proportion_confidence_interval([5], [10], method='exact')
+
+
+def test_bootstrap_interval_matches_normal_approximation():
+    intervals = bootstrap_rate_intervals([500, 0], [1000, 50], 4000, seed=7)
+    assert intervals.loc[0, 'rate'] == 0.5
+    assert intervals.loc[0, ['ci_lower', 'ci_upper']].tolist() == pytest.approx([0.469, 0.531], abs=0.005)
+    assert intervals.loc[1, ['ci_lower', 'ci_upper']].tolist() == [0, 0]
+
+
+def test_bootstrap_interval_is_reproducible():
+    first = bootstrap_rate_intervals([30, 70], [200, 400], 500, seed=3, workers=2)
+    second = bootstrap_rate_intervals([30, 70], [200, 400], 500, seed=3, workers=2)
+    assert first.equals(second)
+
+
+def test_cusum_threshold_grows_with_series_length():
+    thresholds = [cusum_threshold(n_periods) for n_periods in (31, 168, 744)]
+    assert thresholds == sorted(thresholds)
+    assert thresholds[0] == pytest.approx(5.25, abs=0.01)
+    assert thresholds[2] == pytest.approx(8.42, abs=0.01)
+
+
+@pytest.mark.parametrize('n_periods, season_length, baseline_periods', [(744, 24, 24), (31, 1, 7)])
+def test_cusum_rarely_alarms_on_noise(n_periods, season_length, baseline_periods):
+    rng = np.random.default_rng(0)
+    panel = rng.poisson(200, size=(1000, n_periods)).astype(float)
+    alarm, _, _ = batched_cusum(standardize_panel(panel, season_length, baseline_periods), baseline_periods)
+    assert (alarm >= 0).mean() < 0.1
+
+
+def test_cusum_finds_level_shift():
+    rng = np.random.default_rng(1)
+    panel = rng.poisson(200, size=(200, 744)).astype(float)
+    panel[:, 500:] += 30
+    alarm, start, direction = batched_cusum(standardize_panel(panel, 24, 24), 24)
+    detected = (alarm >= 500) & (direction == 1)
+    assert detected.mean() > 0.9
+    assert np.median(np.abs(start[detected] - 500)) <= 2